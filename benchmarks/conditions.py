@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+''' Compares evaluating the conditions found in ``xml/`` by walking the tree
+with ``ConditionTransformer`` against the compiled closures returned by
+``Condition.compile``. Run it from the root of the repository:
+
+    python benchmarks/conditions.py [iterations]
+'''
+from xml.dom import minidom
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cacahuate.grammar import Condition, ConditionTransformer  # noqa
+from cacahuate.xml import get_text  # noqa
+
+XML_PATH = os.path.join(os.path.dirname(__file__), '..', 'xml')
+
+# Candidate values for the refs of a condition, the first one that can be
+# compared against the other operands is used
+CANDIDATES = (0, '0', True)
+
+
+def find_conditions():
+    conditions = set()
+
+    for filename in glob.glob(os.path.join(XML_PATH, '*.xml')):
+        try:
+            dom = minidom.parse(filename)
+        except Exception:
+            continue
+
+        for element in dom.getElementsByTagName('condition'):
+            conditions.add(get_text(element))
+
+    return sorted(conditions)
+
+
+def make_values(tree):
+    refs = [
+        tuple(child.children[0][:] for child in ref.children)
+        for ref in tree.find_data('ref')
+    ]
+
+    for candidate in CANDIDATES:
+        values = {}
+
+        for obj_id, member in refs:
+            values.setdefault(obj_id, {})[member] = candidate
+
+        try:
+            ConditionTransformer(values).transform(tree)
+        except Exception:
+            continue
+
+        return values
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    print('{:<70} {:>12} {:>12} {:>8}'.format(
+        'condition', 'transformer', 'compiled', 'speedup',
+    ))
+
+    for condition in find_conditions():
+        tree = Condition().parse(condition)
+        values = make_values(tree)
+
+        if values is None:
+            continue
+
+        function = Condition().compile(condition)
+
+        assert function(values) == \
+            ConditionTransformer(values).transform(tree)
+
+        transformer_time = timeit.timeit(
+            lambda: ConditionTransformer(values).transform(tree),
+            number=number,
+        )
+        compiled_time = timeit.timeit(
+            lambda: function(values),
+            number=number,
+        )
+
+        print('{:<70} {:>10.2f}us {:>10.2f}us {:>7.1f}x'.format(
+            condition[:70],
+            transformer_time / number * 1e6,
+            compiled_time / number * 1e6,
+            transformer_time / compiled_time,
+        ))
+
+
+if __name__ == '__main__':
+    main()
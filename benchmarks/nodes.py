@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+''' Compares building the nodes and inputs found in ``xml/`` by looking their
+class up with ``pascalcase`` and ``__import__``, as ``make_node`` and
+``make_input`` used to, against the static registries they use now. Run it
+from the root of the repository:
+
+    python benchmarks/nodes.py [iterations]
+'''
+from unittest.mock import MagicMock
+from xml.dom import minidom
+import glob
+import os
+import sys
+import timeit
+
+from case_conversion import pascalcase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cacahuate import inputs, node  # noqa
+
+XML_PATH = os.path.join(os.path.dirname(__file__), '..', 'xml')
+
+
+def old_make_input(element, context=None):
+    classattr = element.getAttribute('type')
+
+    if not context:
+        context = {}
+
+    if classattr not in inputs.INPUTS:
+        raise ValueError(
+            'Class definition not found for input: {}'.format(classattr)
+        )
+
+    class_name = pascalcase(classattr) + 'Input'
+    available_classes = __import__(inputs.__name__).inputs
+
+    return getattr(available_classes, class_name)(element, context)
+
+
+def old_make_node(element, xmliter, context=None):
+    if not context:
+        context = {}
+
+    if element.tagName not in node.NODES:
+        raise ValueError(
+            'Class definition not found for node: {}'.format(element.tagName)
+        )
+
+    class_name = pascalcase(element.tagName)
+    available_classes = __import__(node.__name__).node
+
+    return getattr(available_classes, class_name)(element, xmliter, context)
+
+
+def find_elements():
+    ''' the fully contained nodes and the inputs of the processes, already
+    expanded so they can be built without an iterator '''
+    nodes = []
+    input_elements = []
+
+    for filename in sorted(glob.glob(os.path.join(XML_PATH, '*.xml'))):
+        try:
+            dom = minidom.parse(filename)
+        except Exception:
+            continue
+
+        for tag in ('action', 'validation', 'request', 'exit'):
+            nodes += dom.getElementsByTagName(tag)
+
+        for element in dom.getElementsByTagName('input'):
+            if element.getAttribute('type') in inputs.INPUTS:
+                input_elements.append(element)
+
+    return nodes, input_elements
+
+
+def build_all(make, elements, *args):
+    for element in elements:
+        try:
+            make(element, *args)
+        except Exception:
+            # some nodes need more than the element to be built, the lookup
+            # was already made anyway
+            pass
+
+
+def compare(name, old, new, elements, number, *args):
+    old_time = timeit.timeit(
+        lambda: build_all(old, elements, *args),
+        number=number,
+    )
+    new_time = timeit.timeit(
+        lambda: build_all(new, elements, *args),
+        number=number,
+    )
+
+    print('{:<12} {:>8} {:>12.2f}us {:>12.2f}us {:>7.2f}x'.format(
+        name,
+        len(elements),
+        old_time / number / len(elements) * 1e6,
+        new_time / number / len(elements) * 1e6,
+        old_time / new_time,
+    ))
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    nodes, input_elements = find_elements()
+    # expanding the element is a no-op, it was fully parsed by minidom
+    xmliter = MagicMock()
+
+    print('{:<12} {:>8} {:>14} {:>14} {:>8}'.format(
+        'kind', 'elements', 'old / elem', 'new / elem', 'speedup',
+    ))
+
+    compare(
+        'input', old_make_input, inputs.make_input, input_elements, number,
+    )
+    # both use the current make_input for the inputs of the nodes
+    compare('node', old_make_node, node.make_node, nodes, number, xmliter)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+''' Compares the xml parser backends reading each process in ``xml/`` in
+full: its metadata, every node built with ``make_node`` and its initial
+state. Run it from the root of the repository:
+
+    python benchmarks/parsers.py [iterations]
+'''
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cacahuate import settings  # noqa
+from cacahuate.errors import MalformedProcess  # noqa
+from cacahuate.node import make_node  # noqa
+from cacahuate.xml import Xml  # noqa
+
+XML_PATH = os.path.join(os.path.dirname(__file__), '..', 'xml')
+
+BACKENDS = ('minidom', 'etree')
+
+
+def make_config(backend):
+    config = {
+        key: getattr(settings, key)
+        for key in dir(settings)
+        if key.isupper()
+    }
+
+    config['XML_PATH'] = XML_PATH
+    config['XML_PARSER'] = backend
+
+    return config
+
+
+def read_process(config, filename):
+    xml = Xml(config, filename)
+    xmliter = iter(xml)
+
+    for element in xmliter:
+        make_node(element, xmliter)
+
+    xml.get_state()
+
+
+def find_processes(config):
+    ''' the processes that can be read completely '''
+    processes = []
+
+    for path in sorted(glob.glob(os.path.join(XML_PATH, '*.xml'))):
+        filename = os.path.basename(path)
+
+        try:
+            read_process(config, filename)
+        except (MalformedProcess, ValueError, StopIteration):
+            continue
+
+        processes.append(filename)
+
+    return processes
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    configs = [make_config(backend) for backend in BACKENDS]
+    totals = [0] * len(BACKENDS)
+
+    print('{:<42} {:>12} {:>12} {:>8}'.format('process', *BACKENDS, 'speedup'))
+
+    for filename in find_processes(configs[0]):
+        times = [
+            timeit.timeit(
+                lambda: read_process(config, filename),
+                number=number,
+            )
+            for config in configs
+        ]
+
+        totals = [total + time for total, time in zip(totals, times)]
+
+        print('{:<42} {:>10.2f}ms {:>10.2f}ms {:>7.2f}x'.format(
+            filename,
+            times[0] / number * 1e3,
+            times[1] / number * 1e3,
+            times[0] / times[1],
+        ))
+
+    print('{:<42} {:>10.2f}ms {:>10.2f}ms {:>7.2f}x'.format(
+        'total',
+        totals[0] / number * 1e3,
+        totals[1] / number * 1e3,
+        totals[0] / totals[1],
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 ''' Logic on how information is invalidated in cascade. It is used by
 validation-type nodes and patch requests '''
+import heapq
+
 from cacahuate.errors import EndOfProcess
 
 
@@ -19,9 +21,6 @@ def get_ref_index(state, node, actor, ref, index):
 def cascade_invalidate(xml, state, invalidated, comment):
     ''' computes a set of fields to be marked as invalid given the
     original `invalidated` set of fields. '''
-    # because this could cause a recursive import
-    from cacahuate.node import make_node
-
     # find the first node that is invalid and select it
     set_values = {
         i['ref']: {
@@ -35,13 +34,35 @@ def cascade_invalidate(xml, state, invalidated, comment):
         i['ref']
         for i in invalidated
     )
-    xmliter = iter(xml)
+    graph = xml.get_graph()
+
+    # only the nodes depending on an invalidated field are visited, in process
+    # order since a node only sees the fields invalidated before it
+    pending = list(graph.unconditional)
+
+    for ref in invalid_refs:
+        pending += graph.dependents.get(ref.split(':')[1], [])
+
+    # a sorted list is already a heap
+    pending = sorted(set(pending))
+    visited = set(pending)
+
+    while pending:
+        position = heapq.heappop(pending)
+        node = graph.nodes[position]
 
-    for element in xmliter:
-        node = make_node(element, xmliter)
         more_fields = node.get_invalidated_fields(invalid_refs, state)
 
-        invalid_refs.update(more_fields)
+        for ref in more_fields:
+            if ref in invalid_refs:
+                continue
+
+            invalid_refs.add(ref)
+
+            for dependent in graph.dependents.get(ref.split(':')[1], []):
+                if dependent > position and dependent not in visited:
+                    visited.add(dependent)
+                    heapq.heappush(pending, dependent)
 
     # computes the keys and values to be used in a mongodb update to set the
     # fields as invalid
@@ -122,10 +143,7 @@ def cascade_invalidate(xml, state, invalidated, comment):
 def track_next_node(xml, state, mongo, config):
     ''' given an xml and the current state, returns the first invalid or
     unfilled node following the xml's ruleset (conditionals) '''
-    from cacahuate.node import make_node
-
-    xmliter = iter(xml)
-    node = make_node(next(xmliter), xmliter)
+    node = xml.get_graph().first()
 
     if node.id in state['state']['items']:
         node_state = state['state']['items'][node.id]['state']
@@ -0,0 +1,133 @@
+''' Background execution of request nodes marked as ``async``. The http call
+runs in a pool of threads so the handler can keep processing other messages,
+when it finishes its result is queued as a regular step message. '''
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import traceback
+
+import pika
+import simplejson as json
+
+LOGGER = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_dispatcher = None
+
+
+class Dispatcher:
+    ''' Runs jobs in a pool of ``ASYNC_REQUEST_WORKERS`` threads, allowing at
+    most ``ASYNC_REQUEST_HOST_LIMIT`` running jobs for the same host. Jobs
+    over the limit wait in a per-host queue so they never hold a thread that
+    jobs for other hosts could use. '''
+
+    def __init__(self, config):
+        self.config = config
+        self.limit = config['ASYNC_REQUEST_HOST_LIMIT']
+        self.executor = ThreadPoolExecutor(
+            max_workers=config['ASYNC_REQUEST_WORKERS'],
+        )
+        self.running = defaultdict(int)
+        self.pending = defaultdict(deque)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def submit(self, host, job):
+        ''' schedules ``job`` (a callable without arguments) to run when
+        there is room for another job for ``host`` '''
+        with self.lock:
+            if self.running[host] >= self.limit:
+                self.pending[host].append(job)
+                return
+
+            self.running[host] += 1
+
+        self.executor.submit(self.run, host, job)
+
+    def run(self, host, job):
+        while job is not None:
+            try:
+                job()
+            except Exception:
+                LOGGER.error(traceback.format_exc())
+
+            # take the next job for this host, if any, in this same thread
+            with self.lock:
+                if self.pending.get(host):
+                    job = self.pending[host].popleft()
+                else:
+                    job = None
+                    self.running[host] -= 1
+
+                    if not self.running[host]:
+                        del self.running[host]
+                        self.pending.pop(host, None)
+
+    def close(self):
+        ''' closes this thread's rabbitmq connection, if any '''
+        connection = getattr(self.local, 'connection', None)
+        self.local.connection = self.local.channel = None
+
+        if connection is None:
+            return
+
+        try:
+            connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+
+    def get_channel(self):
+        ''' returns this thread's rabbitmq channel, channels can't be shared
+        between threads '''
+        channel = getattr(self.local, 'channel', None)
+
+        if channel is None or channel.is_closed:
+            self.close()
+
+            connection = pika.BlockingConnection(pika.ConnectionParameters(
+                host=self.config['RABBIT_HOST'],
+                credentials=pika.PlainCredentials(
+                    self.config['RABBIT_USER'],
+                    self.config['RABBIT_PASS'],
+                ),
+                heartbeat=self.config['RABBIT_HEARTBEAT'],
+            ))
+            self.local.connection = connection
+            channel = self.local.channel = connection.channel()
+
+        return channel
+
+    def publish(self, message):
+        ''' queues the given message for the handler '''
+        body = json.dumps(message)
+
+        for attempt in range(2):
+            try:
+                return self.get_channel().basic_publish(
+                    exchange='',
+                    routing_key=self.config['RABBIT_QUEUE'],
+                    body=body,
+                    properties=pika.BasicProperties(
+                        delivery_mode=2,
+                    ),
+                )
+            except pika.exceptions.AMQPError:
+                if attempt:
+                    raise
+
+                # the connection might have been dropped while idle, retry
+                # with a fresh one
+                self.close()
+
+
+def get_dispatcher(config):
+    ''' returns the dispatcher shared by this process '''
+    global _dispatcher
+
+    if _dispatcher is None:
+        with _lock:
+            if _dispatcher is None:
+                _dispatcher = Dispatcher(config)
+
+    return _dispatcher
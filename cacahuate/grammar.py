@@ -1,26 +1,59 @@
+from functools import lru_cache
 from lark import Lark, Transformer
+from threading import Lock
 import operator
 import os
 
+GRAMMAR_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'grammars/condition.g'
+)
+
+# how many distinct condition strings keep their parse tree in memory
+PARSE_CACHE_SIZE = 1024
+
+_parser = None
+_parser_lock = Lock()
+
+
+def get_parser():
+    ''' returns the condition parser, which is built only once per process
+    because building a LALR parser is far more expensive than using it '''
+    global _parser
+
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                with open(GRAMMAR_PATH) as grammar_file:
+                    _parser = Lark(
+                        grammar_file.read(),
+                        start='or_test',
+                        parser='lalr',
+                    )
+
+    return _parser
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_condition(string):
+    ''' returns the tree of the given condition, memoized by its source.
+    Trees must be treated as read-only since they are shared '''
+    return get_parser().parse(string)
+
 
 class Condition:
 
     def __init__(self):
-        filename = os.path.join(
-            os.path.dirname(__file__),
-            'grammars/condition.g'
-        )
-
-        with open(filename) as grammar_file:
-            self.parser = Lark(
-                grammar_file.read(),
-                start='or_test',
-                parser='lalr',
-            )
+        self.parser = get_parser()
 
     def parse(self, string):
         ''' returns the tree '''
-        return self.parser.parse(string)
+        return parse_condition(string)
+
+    def compile(self, string):
+        ''' returns a function that evaluates the condition given the values
+        taken from the state of the execution '''
+        return compile_tree(self.parse(string))
 
 
 class ConditionTransformer(Transformer):
@@ -130,3 +163,93 @@ class ConditionTransformer(Transformer):
 
     def atom_expr(self, tokens):
         return self.test_aux(tokens)
+
+
+UNARY_OPERATORS = {
+    'op_not': operator.not_,
+}
+
+BINARY_OPERATORS = {
+    'op_eq': operator.eq,
+    'op_ne': operator.ne,
+    'op_lt': operator.lt,
+    'op_lte': operator.le,
+    'op_gt': operator.gt,
+    'op_gte': operator.ge,
+    'op_or': operator.or_,
+    'op_and': operator.and_,
+    'op_in': lambda x, y: x in y,
+    'op_not_in': lambda x, y: x not in y,
+}
+
+
+def compile_tree(tree):
+    ''' turns a tree returned by ``Condition.parse`` into a function of the
+    values with exactly the semantics of ``ConditionTransformer``: every
+    operand is evaluated and operators are applied left to right. The tree is
+    walked only once, here, so evaluating the function is just a few nested
+    calls. '''
+    if tree.data == 'const_true':
+        return lambda values: True
+
+    if tree.data == 'const_false':
+        return lambda values: False
+
+    if tree.data == 'string':
+        string = tree.children[0][1:-1]
+
+        return lambda values: string
+
+    if tree.data == 'number':
+        number = float(tree.children[0])
+
+        return lambda values: number
+
+    if tree.data == 'ref':
+        obj_id, member = (child.children[0][:] for child in tree.children)
+
+        return lambda values: values[obj_id][member]
+
+    if tree.data == 'list':
+        items = [
+            compile_tree(item)
+            for testlist in tree.children
+            for item in testlist.children
+        ]
+
+        return lambda values: [item(values) for item in items]
+
+    return compile_sequence(tree.children)
+
+
+def compile_sequence(children):
+    ''' compiles the children of rules handled by
+    ``ConditionTransformer.test_aux`` '''
+    if len(children) == 1:
+        return compile_tree(children[0])
+
+    if len(children) == 2:
+        op = UNARY_OPERATORS[children[0].data]
+        right = compile_tree(children[1])
+
+        return lambda values: op(right(values))
+
+    operands = [compile_tree(child) for child in children[0::2]]
+    ops = [BINARY_OPERATORS[child.data] for child in children[1::2]]
+
+    if len(ops) == 1:
+        left, right = operands
+        op = ops[0]
+
+        return lambda values: op(left(values), right(values))
+
+    def evaluate(values):
+        results = [operand(values) for operand in operands]
+        result = results[0]
+
+        for op, right in zip(ops, results[1:]):
+            result = op(result, right)
+
+        return result
+
+    return evaluate
@@ -0,0 +1,130 @@
+''' A compiled representation of a process definition. The xml file is parsed
+once into a list of prebuilt nodes plus the little structural information
+needed to move through it (block depth and where each subtree ends), so
+finding a node or its successor does not require to parse the file again.
+It also knows which nodes depend on each field, so invalidating a field only
+visits the nodes affected by it.
+Compiled graphs are cached in-process by path and modification time. '''
+import os
+
+from cacahuate.errors import ElementNotFound
+
+CONDITIONAL_NODES = ('if', 'elif', 'else')
+
+_GRAPHS = {}
+
+
+class ProcessGraph:
+
+    def __init__(self, xml, mtime=None):
+        # because this could cause a recursive import
+        from cacahuate.node import make_node
+
+        self.filename = xml.filename
+        self.mtime = mtime
+
+        self.nodes = []
+        self.tags = []
+        self.depths = []
+        self.index = {}
+
+        xmliter = iter(xml)
+
+        for element in xmliter:
+            # depth is the number of blocks enclosing this element
+            self.depths.append(len(xmliter.block_stack))
+            self.tags.append(element.tagName)
+
+            node = make_node(element, xmliter)
+
+            self.index.setdefault(node.id, len(self.nodes))
+            self.nodes.append(node)
+
+        # position of the first node following each node's subtree, only
+        # conditionals contain other nodes
+        self.ends = []
+
+        for i, tag in enumerate(self.tags):
+            end = i + 1
+
+            if tag in CONDITIONAL_NODES:
+                while end < len(self.nodes) and \
+                        self.depths[end] > self.depths[i]:
+                    end += 1
+
+            self.ends.append(end)
+
+        # positions of the nodes with fields computed from each ``form.input``
+        # and of the ones that must be invalidated no matter what changed
+        self.dependents = {}
+        self.unconditional = []
+
+        for i, node in enumerate(self.nodes):
+            for dep, form, input in node.dependent_fields():
+                if dep is None:
+                    positions = self.unconditional
+                else:
+                    positions = self.dependents.setdefault(dep, [])
+
+                if i not in positions:
+                    positions.append(i)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def first(self):
+        try:
+            return self.nodes[0]
+        except IndexError:
+            raise StopIteration
+
+    def position(self, node_id):
+        try:
+            return self.index[node_id]
+        except KeyError:
+            raise ElementNotFound(
+                'node matching the given condition was not found'
+            )
+
+    def get_node(self, node_id):
+        return self.nodes[self.position(node_id)]
+
+    def next_of(self, node_id, skip_block=False):
+        ''' returns the node following the given one by adjacency. If
+        ``skip_block`` is true the children of the node are skipped, which is
+        what happens with a conditional whose condition is false. When the
+        next node is outside of the current block the ``elif`` and ``else``
+        siblings of the finished conditional are skipped too. Raises
+        StopIteration at the end of the process '''
+        i = self.position(node_id)
+        j = self.ends[i] if skip_block else i + 1
+
+        if j >= len(self.nodes):
+            raise StopIteration
+
+        if self.depths[j] < self.depths[i]:
+            while self.tags[j] in ('elif', 'else'):
+                j = self.ends[j]
+
+                if j >= len(self.nodes):
+                    raise StopIteration
+
+        return self.nodes[j]
+
+
+def get_graph(xml):
+    ''' returns the compiled graph of the given process, building it only if
+    the file changed since the last time it was requested '''
+    path = xml.get_file_path()
+    mtime = os.stat(path).st_mtime
+
+    graph = _GRAPHS.get(path)
+
+    if graph is None or graph.mtime != mtime:
+        graph = ProcessGraph(xml, mtime)
+        _GRAPHS[path] = graph
+
+    return graph
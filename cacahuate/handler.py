@@ -3,6 +3,7 @@ import logging
 
 from coralillo.errors import ModelNotFoundError
 from pymongo import MongoClient
+from pymongo import InsertOne, UpdateOne, UpdateMany
 import pymongo
 import pika
 import simplejson as json
@@ -11,10 +12,10 @@ from cacahuate.errors import InconsistentState
 from cacahuate.errors import MisconfiguredProvider, EndOfProcess
 from cacahuate.models import Execution, Pointer, User
 from cacahuate.xml import Xml
-from cacahuate.node import make_node, UserAttachedNode
+from cacahuate.node import UserAttachedNode, Request
 from cacahuate.jsontypes import Map
 from cacahuate.cascade import cascade_invalidate, track_next_node
-from cacahuate.mongo import make_context, pointer_entry
+from cacahuate.mongo import make_context, pointer_entry, HandlerDatabase
 from cacahuate.templates import render_or
 
 LOGGER = logging.getLogger(__name__)
@@ -33,6 +34,8 @@ class Handler:
         arrives from rabbitmq. '''
         message = json.loads(body)
 
+        self.get_mongo().reset()
+
         if message['command'] == 'cancel':
             self.cancel_execution(message)
         elif message['command'] == 'step':
@@ -44,6 +47,11 @@ class Handler:
                 'Unrecognized command {}'.format(message['command'])
             )
 
+        LOGGER.debug('{} made {reads} mongo reads and {writes} writes'.format(
+            message['command'],
+            **self.get_mongo().counts
+        ))
+
     def step(self, message: dict, channel):
         ''' Handles deleting a pointer from the current node and creating a new
         one on the next '''
@@ -51,24 +59,24 @@ class Handler:
         execution = pointer.proxy.execution.get()
 
         xml = Xml.load(self.config, execution.process_name, direct=True)
-        xmliter = iter(xml)
-
-        node = make_node(xmliter.find(
-            lambda e: e.getAttribute('id') == pointer.node_id
-        ), xmliter)
+        node = xml.get_graph().get_node(pointer.node_id)
 
-        # node's lifetime ends here
-        self.teardown(node, pointer, user, input)
-        execution.reload()
-
-        # compute the next node in the sequence
         try:
-            next_node, state = self.next(xml, node, execution)
-        except EndOfProcess:
-            # finish the execution
-            return self.finish_execution(execution)
-
-        self.wakeup_and_notify(next_node, execution, channel, state)
+            # node's lifetime ends here
+            state = self.teardown(node, pointer, user, input)
+            execution.reload()
+
+            # compute the next node in the sequence
+            try:
+                next_node, state = self.next(xml, node, execution, state)
+            except EndOfProcess:
+                # finish the execution
+                return self.finish_execution(execution)
+
+            self.wakeup_and_notify(next_node, execution, channel, state)
+        finally:
+            # send the writes deferred during the step
+            self.get_mongo().flush()
 
     def wakeup_and_notify(self, node, execution, channel, state):
         ''' Calls wakeup on the given node and notifies if it is a sync node
@@ -80,6 +88,9 @@ class Handler:
         if qdata:
             new_pointer, new_input = qdata
 
+            # the queued step must find this one's writes
+            self.get_mongo().flush()
+
             channel.basic_publish(
                 exchange='',
                 routing_key=self.config['RABBIT_QUEUE'],
@@ -94,25 +105,21 @@ class Handler:
                 ),
             )
 
-    def next(self, xml, node, execution):
-        ''' Given a position in the script, return the next position '''
+    def next(self, xml, node, execution, state):
+        ''' Given a position in the script and the current state of the
+        execution, return the next position '''
         # Return next node by simple adjacency, works for actions and accepted
         # validations
-
-        state = next(self.execution_collection().find({'id': execution.id}))
-
         try:
             while True:
-                node = node.next(
+                # rejected validations hand back the state they invalidated
+                node, state = node.next_with_state(
                     xml,
                     state,
                     self.get_mongo(),
                     self.config,
                 )
 
-                # refresh state because previous call might have changed it
-                state = next(self.execution_collection().find({'id': execution.id}))
-
                 if node.id in state['state']['items']:
                     if state['state']['items'][node.id]['state'] == 'valid':
                         continue
@@ -127,8 +134,7 @@ class Handler:
         the execution, this is the first step in a node's lifecycle '''
 
         # get currect execution context
-        exc_doc = next(self.execution_collection().find({'id': execution.id}))
-        context = make_context(exc_doc, self.config)
+        context = make_context(state, self.config)
 
         # create a pointer in this node
         pointer = self._create_pointer(
@@ -144,7 +150,7 @@ class Handler:
         ))
 
         # mark this node as ongoing
-        self.execution_collection().update_one({
+        self.defer_execution(UpdateOne({
             'id': execution.id,
         }, {
             '$set': {
@@ -152,12 +158,12 @@ class Handler:
                 'state.items.{}.name'.format(node.id): pointer.name,
                 'state.items.{}.description'.format(node.id): pointer.description,
             },
-        })
+        }))
 
         # update registry about this pointer
-        self.pointer_collection().insert_one(pointer_entry(
+        self.defer_pointer(InsertOne(pointer_entry(
             node, pointer.name, pointer.description, execution, pointer
-        ))
+        )))
 
         # notify someone (can raise an exception
         if isinstance(node, UserAttachedNode):
@@ -165,27 +171,40 @@ class Handler:
         else:
             notified_users = []
 
+        pointer_update = {
+            'notified_users': notified_users,
+        }
+
         # do some work (can raise an exception)
         if not node.is_async():
             input = node.work(self.config, state, channel, self.get_mongo())
         else:
             input = []
 
+        dispatch = isinstance(node, Request) and node.is_async()
+
+        if dispatch:
+            pointer_update['waiting'] = 'request'
+
         # set actors to this pointer (means everything succeeded)
-        self.pointer_collection().update_one({
+        self.defer_pointer(UpdateOne({
             'id': pointer.id,
         }, {
-            '$set': {
-                'notified_users': notified_users,
-            },
-        })
+            '$set': pointer_update,
+        }))
+
+        # async requests queue their own input when the response arrives
+        if dispatch:
+            self.get_mongo().flush()
+            node.dispatch(self.config, state, pointer.id)
 
         # nodes with forms are not queued
         if not node.is_async():
             return pointer, input
 
     def teardown(self, node, pointer, user, forms):
-        ''' finishes the node's lifecycle '''
+        ''' finishes the node's lifecycle, returns the updated execution
+        document '''
         execution = pointer.proxy.execution.get()
         execution.proxy.actors.add(user)
 
@@ -200,34 +219,26 @@ class Handler:
             'forms': forms,
         }
 
-        # update pointer
-        self.pointer_collection().update_one({
-            'id': pointer.id,
-        }, {
-            '$set': {
-                'state': 'finished',
-                'finished_at': datetime.now(),
-                'actors': Map(
-                    [actor_json],
-                    key=lambda a: a['user']['identifier']
-                ).to_json(),
-                'actor_list': [
-                    {
-                        'form': form['ref'],
-                        'actor': user.to_json(include=[
-                            '_type',
-                            'fullname',
-                            'identifier',
-                        ]),
-                    } for form in forms
-                ],
-            },
-        })
-
+        finished_at = datetime.now()
         values = self.compact_values(forms)
 
         # update state
-        self.execution_collection().update_one(
+        mongo_exe = self.execution_collection().find_one_and_update(
+            {'id': execution.id},
+            {
+                '$set': {**{
+                    'state.items.{node}.state'.format(node=node.id): 'valid',
+                    'state.items.{node}.actors.items.{identifier}'.format(
+                        node=node.id,
+                        identifier=user.identifier,
+                    ): actor_json,
+                    'actors.{}'.format(node.id): user.identifier,
+                }, **values},
+            },
+            return_document=pymongo.collection.ReturnDocument.AFTER,
+        )
+
+        self.defer_execution(UpdateOne(
             {
                 'id': execution.id,
                 '$or': [
@@ -256,22 +267,10 @@ class Handler:
                     },
                 },
             },
-        )
+        ))
 
-        mongo_exe = self.execution_collection().find_one_and_update(
-            {'id': execution.id},
-            {
-                '$set': {**{
-                    'state.items.{node}.state'.format(node=node.id): 'valid',
-                    'state.items.{node}.actors.items.{identifier}'.format(
-                        node=node.id,
-                        identifier=user.identifier,
-                    ): actor_json,
-                    'actors.{}'.format(node.id): user.identifier,
-                }, **values},
-            },
-            return_document=pymongo.collection.ReturnDocument.AFTER,
-        )
+        # indexed copy of the identifiers in ``actors``, used by the inbox
+        actor_identifiers = sorted(set(mongo_exe['actors'].values()))
 
         context = make_context(mongo_exe, self.config)
 
@@ -288,22 +287,72 @@ class Handler:
         )
         execution.save()
 
-        self.execution_collection().update_one(
+        self.defer_execution(UpdateOne(
             {'id': execution.id},
             {'$set': {
                 'name': execution.name,
                 'description': execution.description,
                 'values._execution.0.name': execution.name,
                 'values._execution.0.description': execution.description,
+                'actor_identifiers': actor_identifiers,
             }},
-        )
+        ))
+
+        # keep the state in sync with the update instead of reading it again
+        mongo_exe['name'] = execution.name
+        mongo_exe['description'] = execution.description
+        mongo_exe['actor_identifiers'] = actor_identifiers
+
+        try:
+            mongo_exe['values']['_execution'][0].update({
+                'name': execution.name,
+                'description': execution.description,
+            })
+        except (KeyError, IndexError, TypeError):
+            mongo_exe = next(self.execution_collection().find({
+                'id': execution.id,
+            }))
+
+        # update pointer
+        self.defer_pointer(UpdateOne({
+            'id': pointer.id,
+        }, {
+            '$set': {
+                'state': 'finished',
+                'finished_at': finished_at,
+                'execution': execution.to_json(),
+                'actors': Map(
+                    [actor_json],
+                    key=lambda a: a['user']['identifier']
+                ).to_json(),
+                'actor_list': [
+                    {
+                        'form': form['ref'],
+                        'actor': user.to_json(include=[
+                            '_type',
+                            'fullname',
+                            'identifier',
+                        ]),
+                    } for form in forms
+                ],
+            },
+            # async requests are no longer waiting for their response
+            '$unset': {
+                'waiting': '',
+            },
+        }))
 
-        self.pointer_collection().update_many(
-            {'execution.id': execution.id},
+        # finished pointers keep the execution as it was when they finished
+        # until the execution ends, only the ongoing ones are kept up to date
+        self.defer_pointer(UpdateMany(
+            {
+                'execution.id': execution.id,
+                'state': 'ongoing',
+            },
             {'$set': {
                 'execution': execution.to_json(),
             }},
-        )
+        ))
 
         LOGGER.debug('Deleted pointer p:{} n:{} e:{}'.format(
             pointer.id,
@@ -313,28 +362,34 @@ class Handler:
 
         pointer.delete()
 
+        return mongo_exe
+
     def finish_execution(self, execution):
         """ shuts down this execution and every related object """
         execution.status = 'finished'
         execution.finished_at = datetime.now()
         execution.save()
 
-        self.execution_collection().update_one({
+        self.defer_execution(UpdateOne({
             'id': execution.id,
         }, {
             '$set': {
                 'status': execution.status,
                 'finished_at': execution.finished_at,
             }
-        })
+        }))
 
-        self.pointer_collection().update_many({
+        # bring the copy of the execution in every pointer up to date, this
+        # is the only time the finished ones are rewritten
+        self.defer_pointer(UpdateMany({
             'execution.id': execution.id,
         }, {
             '$set': {
                 'execution': execution.to_json(),
             }
-        })
+        }))
+
+        self.get_mongo().flush()
 
         LOGGER.debug('Finished e:{}'.format(execution.id))
 
@@ -434,7 +489,7 @@ class Handler:
             client = MongoClient(self.config['MONGO_URI'])
             db = client[self.config['MONGO_DBNAME']]
 
-            self.mongo = db
+            self.mongo = HandlerDatabase(db)
 
         return self.mongo
 
@@ -444,6 +499,12 @@ class Handler:
     def pointer_collection(self):
         return self.get_mongo()[self.config['POINTER_COLLECTION']]
 
+    def defer_execution(self, operation):
+        self.get_mongo().defer(self.config['EXECUTION_COLLECTION'], operation)
+
+    def defer_pointer(self, operation):
+        self.get_mongo().defer(self.config['POINTER_COLLECTION'], operation)
+
     def get_contact_channels(self, user: User):
         return [('email', {
             'recipient': user.get_contact_info('email'),
@@ -558,7 +619,12 @@ class Handler:
         )
 
         # wakeup and start execution from the found invalid node
-        self.wakeup_and_notify(first_invalid_node, execution, channel, state)
+        try:
+            self.wakeup_and_notify(
+                first_invalid_node, execution, channel, state
+            )
+        finally:
+            self.get_mongo().flush()
 
     def cancel_execution(self, message):
         execution = Execution.get_or_exception(message['execution_id'])
@@ -587,6 +653,7 @@ class Handler:
             }
         })
 
+        # bring the copy of the execution in every pointer up to date
         self.pointer_collection().update_many({
             'execution.id': execution.id,
         }, {
@@ -1,11 +1,26 @@
-from flask import jsonify, request
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from flask import jsonify, request, json, Response, stream_with_context
 from functools import wraps
 from werkzeug.exceptions import BadRequest as WBadRequest
 from flask import g
+from coralillo.datamodel import debyte_hash, debyte_string
+from itertools import chain
+import hashlib
+import threading
+import time
+
 from cacahuate.http.errors import BadRequest, Unauthorized
 from cacahuate.models import User, Token
+from cacahuate.mongo import json_prepare
 from cacahuate.http.wsgi import app
 
+# Recently authenticated users by (identifier, token hash), each entry holds
+# its expiration time and the (id, data) of the user
+AUTH_CACHE = OrderedDict()
+AUTH_CACHE_LOCK = threading.Lock()
+
 
 def requires_json(view):
     @wraps(view)
@@ -34,6 +49,118 @@ def requires_json(view):
     return wrapper
 
 
+# Finds the user by identifier and checks it owns the token, returns the id
+# and the data of the user or nil
+FETCH_USER_LUA = '''
+local user_id = redis.call('HGET', KEYS[1], ARGV[1])
+local token_id = redis.call('HGET', KEYS[2], ARGV[2])
+
+if not user_id or not token_id then
+    return nil
+end
+
+local owner = redis.call('HGET', ARGV[4] .. ':' .. token_id .. ':obj', 'user')
+
+if owner ~= user_id then
+    return nil
+end
+
+local data = redis.call('HGETALL', ARGV[3] .. ':' .. user_id .. ':obj')
+
+if #data == 0 then
+    return nil
+end
+
+return {user_id, data}
+'''
+
+_fetch_user_script = None
+
+
+def fetch_user(identifier, token):
+    ''' returns the (id, data) of the user with the given identifier if it
+    owns the given token, or None. Runs a lua script so it takes a single
+    call to redis instead of loading the user, the token and the token's
+    user one by one '''
+    global _fetch_user_script
+
+    redis = User.get_redis()
+
+    if _fetch_user_script is None:
+        # sent with EVALSHA, the script is loaded again if redis lost it
+        _fetch_user_script = redis.register_script(FETCH_USER_LUA)
+
+    found = _fetch_user_script(keys=[
+        User.cls_key() + ':index_identifier',
+        Token.cls_key() + ':index_token',
+    ], args=[
+        identifier,
+        token,
+        User.cls_key(),
+        Token.cls_key(),
+    ], client=redis)
+
+    if not found:
+        return None
+
+    user_id, data = found
+
+    return debyte_string(user_id), debyte_hash(
+        dict(zip(data[::2], data[1::2]))
+    )
+
+
+def make_user(user_id, data):
+    ''' builds the user model from the data returned by ``fetch_user`` the
+    same way ``User.get`` does '''
+    user = User(id=user_id)
+    user._persisted = True
+
+    for fieldname, field in user.proxy:
+        setattr(user, fieldname, field.recover(data, None))
+
+    return user
+
+
+def authenticate(identifier, token):
+    ''' returns the user that owns the given token. Successful logins are
+    cached for ``AUTH_CACHE_TTL`` seconds so clients polling the api don't
+    hit redis on every request '''
+    ttl = app.config['AUTH_CACHE_TTL']
+    key = (identifier, hashlib.sha256(token.encode('utf8')).hexdigest())
+    now = time.monotonic()
+
+    with AUTH_CACHE_LOCK:
+        expires, found = AUTH_CACHE.get(key, (0, None))
+
+    if expires <= now:
+        found = fetch_user(identifier, token)
+
+        if found is not None and ttl:
+            with AUTH_CACHE_LOCK:
+                AUTH_CACHE[key] = (now + ttl, found)
+                AUTH_CACHE.move_to_end(key)
+
+                while len(AUTH_CACHE) > app.config['AUTH_CACHE_SIZE']:
+                    AUTH_CACHE.popitem(last=False)
+
+    if found is None:
+        raise Unauthorized([{
+            'detail': 'Your credentials are invalid, sorry',
+            'where': 'request.authorization',
+        }])
+
+    return make_user(*found)
+
+
+def forget_user(identifier):
+    ''' removes the cached logins of the given user, needed when its data or
+    tokens change '''
+    with AUTH_CACHE_LOCK:
+        for key in [key for key in AUTH_CACHE if key[0] == identifier]:
+            del AUTH_CACHE[key]
+
+
 def requires_auth(view):
     @wraps(view)
     def wrapper(*args, **kwargs):
@@ -43,21 +170,10 @@ def requires_auth(view):
                 'where': 'request.authorization',
             }])
 
-        identifier = request.authorization['username']
-        token = request.authorization['password']
-
-        user = User.get_by('identifier', identifier)
-        token = Token.get_by('token', token)
-
-        if (
-            user is None or token is None or token.proxy.user.get().id != user.id
-        ):
-            raise Unauthorized([{
-                'detail': 'Your credentials are invalid, sorry',
-                'where': 'request.authorization',
-            }])
-
-        g.user = user
+        g.user = authenticate(
+            request.authorization['username'],
+            request.authorization['password'],
+        )
 
         return view(*args, **kwargs)
     return wrapper
@@ -82,5 +198,206 @@ def pagination(view):
         g.offset = int(offset)
         g.limit = int(limit)
 
+        # keyset pagination is enabled by ``?after=``, empty for the first
+        # page. The cursor replaces the offset
+        g.keyset = 'after' in request.args
+        g.after = parse_cursor(request.args.get('after'))
+
+        if g.keyset:
+            g.offset = 0
+
+        g.count = request.args.get('count', 'exact')
+
+        if g.count not in ('exact', 'estimated', 'none'):
+            raise BadRequest([{
+                'detail': 'count must be one of exact, estimated or none',
+                'where': 'request.args.count',
+            }])
+
         return view(*args, **kwargs)
     return wrapper
+
+
+def make_cursor(doc):
+    ''' returns the value of ``?after=`` that continues a listing sorted by
+    ``(started_at, id)`` after the given document '''
+    if not isinstance(doc.get('started_at'), datetime) or 'id' not in doc:
+        return None
+
+    return urlsafe_b64encode(json.dumps(
+        [doc['started_at'].isoformat(), doc['id']],
+    ).encode('utf8')).decode('ascii')
+
+
+def cursor_projection(projection):
+    ''' returns the given ``include``/``exclude`` projection with the fields
+    needed by ``make_cursor`` added back, and the list of those fields the
+    client didn't ask for, to be passed to ``stream_listing`` as
+    ``hidden`` '''
+    if not g.keyset or not projection:
+        return projection, []
+
+    projection = dict(projection)
+    hidden = []
+    including = 1 in projection.values()
+
+    for field in ('started_at', 'id'):
+        if including and field not in projection:
+            projection[field] = 1
+            hidden.append(field)
+        elif not including and field in projection:
+            del projection[field]
+            hidden.append(field)
+
+    return projection, hidden
+
+
+def parse_cursor(cursor):
+    ''' the inverse of ``make_cursor``, returns a (started_at, id) pair '''
+    if not cursor:
+        return None
+
+    try:
+        started_at, id = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+
+        return datetime.fromisoformat(started_at), str(id)
+    except (ValueError, TypeError):
+        raise BadRequest([{
+            'detail': 'after is not a valid cursor',
+            'where': 'request.args.after',
+        }])
+
+
+def stream_listing(
+    docs, key='data', prepare=json_prepare, total_count=None, hidden=(),
+):
+    ''' streams a listing, serializing each document as it comes from the
+    cursor instead of building the whole page in memory first. The body is
+    the usual json object, or one document per line if the client accepts
+    ``application/x-ndjson``, in which case the count goes in the
+    ``X-Total-Count`` header and ``next_cursor`` in a last line of
+    ``_type`` cursor. The ``hidden`` fields are only used to build the
+    cursor '''
+    docs = iter(docs)
+
+    # runs the query, so its errors happen before the response starts
+    first = next(docs, None)
+
+    if first is not None:
+        docs = chain([first], docs)
+
+    ndjson = request.accept_mimetypes.best_match([
+        'application/json',
+        'application/x-ndjson',
+    ]) == 'application/x-ndjson'
+
+    def serialize(doc):
+        data = prepare(doc)
+
+        for field in hidden:
+            data.pop(field, None)
+
+        return json.dumps(data)
+
+    def next_cursor(last, count):
+        if last is None or count < g.limit:
+            return None
+
+        return make_cursor(last)
+
+    def generate_ndjson():
+        count = 0
+        last = None
+
+        for doc in docs:
+            yield serialize(doc) + '\n'
+
+            count += 1
+            last = doc
+
+        if g.keyset:
+            yield json.dumps({
+                '_type': 'cursor',
+                'next_cursor': next_cursor(last, count),
+            }) + '\n'
+
+    def generate_json():
+        count = 0
+        last = None
+
+        yield '{{{}: ['.format(json.dumps(key))
+
+        for doc in docs:
+            yield (',' if count else '') + serialize(doc)
+
+            count += 1
+            last = doc
+
+        yield ']'
+
+        if total_count is not None:
+            yield ', "total_count": {}'.format(json.dumps(total_count))
+
+        if g.keyset:
+            yield ', "next_cursor": {}'.format(
+                json.dumps(next_cursor(last, count)),
+            )
+
+        yield '}\n'
+
+    if ndjson:
+        response = Response(
+            stream_with_context(generate_ndjson()),
+            mimetype='application/x-ndjson',
+        )
+
+        if total_count is not None:
+            response.headers['X-Total-Count'] = str(total_count)
+
+        return response
+
+    return Response(
+        stream_with_context(generate_json()),
+        mimetype='application/json',
+    )
+
+
+def after(query, sort_query=None):
+    ''' restricts ``query`` to the documents after the cursor given in
+    ``?after=``. Cursors follow the default sort, so they can't be combined
+    with a custom one '''
+    if not g.keyset:
+        return query
+
+    if sort_query:
+        raise BadRequest([{
+            'detail': 'after can not be combined with sort',
+            'where': 'request.args.after',
+        }])
+
+    if g.after is None:
+        return query
+
+    started_at, id = g.after
+    condition = {'$or': [
+        {'started_at': {'$lt': started_at}},
+        {'started_at': started_at, 'id': {'$gt': id}},
+    ]}
+
+    if not query:
+        return condition
+
+    return {'$and': [query, condition]}
+
+
+def count(collection, query):
+    ''' the ``total_count`` of a listing as requested by ``?count=``: exact,
+    estimated from the collection's metadata when there is no filter, or
+    none at all '''
+    if g.count == 'none':
+        return None
+
+    if g.count == 'estimated' and not query:
+        return collection.estimated_document_count()
+
+    return collection.count_documents(query)
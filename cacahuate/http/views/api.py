@@ -1,7 +1,6 @@
 import http
 import copy
 import re
-import os
 
 from cacahuate.mongo import make_context
 
@@ -21,6 +20,8 @@ from cacahuate.errors import ProcessNotFound, ElementNotFound, MalformedProcess
 from cacahuate.http.errors import BadRequest, NotFound, UnprocessableEntity
 from cacahuate.http.errors import Forbidden
 from cacahuate.http.middleware import requires_json, requires_auth, pagination
+from cacahuate.http.middleware import after, count, stream_listing
+from cacahuate.http.middleware import cursor_projection
 from cacahuate.http.validation import validate_json, validate_auth
 from cacahuate.http.wsgi import app, mongo
 from cacahuate.models import Execution, Pointer, User
@@ -31,6 +32,50 @@ from cacahuate.node import make_input
 from cacahuate.mongo import json_prepare
 
 
+def user_executions(identifier):
+    ''' query for the ongoing executions the given user has acted in, the
+    ones in the user's activities '''
+    return {
+        'actor_list.actor.identifier': identifier,
+        'status': 'ongoing',
+    }
+
+
+def user_pointers(identifier):
+    ''' query for the ongoing pointers the given user is a candidate for, the
+    ones in the user's tasks '''
+    return {
+        'notified_users.identifier': identifier,
+        'state': 'ongoing',
+    }
+
+
+def index_valid_forms(state):
+    ''' maps each form ref to the valid forms of the execution with that ref,
+    in state order, as ``(prefix, form)`` pairs where ``prefix`` is the
+    ``node.actor.index`` part of their fields' refs '''
+    forms_by_ref = dict()
+
+    for node in state['state']['items'].values():
+        if node['state'] != 'valid':
+            continue
+
+        for identifier, actor in node['actors']['items'].items():
+            if actor['state'] != 'valid':
+                continue
+
+            for form_ix, form in enumerate(actor['forms']):
+                if form['state'] != 'valid':
+                    continue
+
+                forms_by_ref.setdefault(form['ref'], []).append((
+                    '.'.join([node['id'], identifier, str(form_ix)]),
+                    form,
+                ))
+
+    return forms_by_ref
+
+
 @app.route('/', methods=['GET', 'POST'])
 @requires_json
 def index():
@@ -80,8 +125,8 @@ def execution_list():
         if k not in app.config['INVALID_FILTERS']
     )
 
-    # sort
-    srt = {'started_at': -1}
+    # sort, ties are broken by id so pages are stable
+    srt = {'started_at': -1, 'id': 1}
     sort_query = exe_query.pop('sort', None)
     if sort_query and sort_query.split(',', 1)[0]:
         try:
@@ -98,14 +143,9 @@ def execution_list():
     # filter for user_identifier
     user_identifier = exe_query.pop('user_identifier', None)
     if user_identifier is not None:
-        user = User.get_by('identifier', user_identifier)
-        if user is not None:
-            execution_list = [item.id for item in user.proxy.activities.get()]
-        else:
-            execution_list = []
-        exe_query['id'] = {
-            '$in': execution_list,
-        }
+        exe_query.setdefault('$and', []).append(
+            user_executions(user_identifier)
+        )
 
     # filter for exclude/include
     exclude_fields = exe_query.pop('exclude', '')
@@ -118,26 +158,25 @@ def execution_list():
 
     # store project for future use
     prjct = {**include_map} or {**exclude_map}
+    prjct, hidden = cursor_projection(prjct)
 
     exe_collection = mongo.db[app.config['EXECUTION_COLLECTION']]
 
     try:
-        cursor_count = exe_collection.count_documents(exe_query)
+        cursor_count = count(exe_collection, exe_query)
         cursor = exe_collection.find(
-            exe_query,
+            after(exe_query, sort_query),
             prjct or None,
-        ).sort(list(srt.items()))
+        ).sort(list(srt.items())).skip(g.offset).limit(g.limit)
+
+        return stream_listing(
+            cursor.batch_size(app.config['PAGINATION_BATCH_SIZE']),
+            total_count=cursor_count,
+            hidden=hidden,
+        )
     except pymongo.errors.OperationFailure:
         flask.abort(400, 'Malformed query')
 
-    return jsonify({
-        'total_count': cursor_count,
-        'data': list(map(
-            json_prepare,
-            cursor.skip(g.offset).limit(g.limit),
-        ))
-    })
-
 
 @app.route('/v1/execution/<id>', methods=['GET'])
 def process_status(id):
@@ -580,8 +619,8 @@ def fetch_pointers():
         if k not in app.config['INVALID_FILTERS']
     )
 
-    # sort
-    srt = {'started_at': -1}
+    # sort, ties are broken by id so pages are stable
+    srt = {'started_at': -1, 'id': 1}
     sort_query = ptr_query.pop('sort', None)
     if sort_query and sort_query.split(',', 1)[0]:
         try:
@@ -598,14 +637,9 @@ def fetch_pointers():
     # filter for user_identifier
     user_identifier = ptr_query.pop('user_identifier', None)
     if user_identifier is not None:
-        user = User.get_by('identifier', user_identifier)
-        if user is not None:
-            pointer_list = [item.id for item in user.proxy.tasks.get()]
-        else:
-            pointer_list = []
-        ptr_query['id'] = {
-            '$in': pointer_list,
-        }
+        ptr_query.setdefault('$and', []).append(
+            user_pointers(user_identifier)
+        )
 
     # filter for exclude/include
     exclude_fields = ptr_query.pop('exclude', '')
@@ -618,40 +652,32 @@ def fetch_pointers():
 
     # store project for future use
     prjct = {**include_map} or {**exclude_map}
+    prjct, hidden = cursor_projection(prjct)
 
     ptr_collection = mongo.db[app.config['POINTER_COLLECTION']]
 
     try:
-        cursor_count = ptr_collection.count_documents(ptr_query)
+        cursor_count = count(ptr_collection, ptr_query)
         cursor = ptr_collection.find(
-            ptr_query,
+            after(ptr_query, sort_query),
             prjct or None,
-        ).sort(list(srt.items()))
+        ).sort(list(srt.items())).skip(g.offset).limit(g.limit)
+
+        return stream_listing(
+            cursor.batch_size(app.config['PAGINATION_BATCH_SIZE']),
+            key='pointers',
+            total_count=cursor_count,
+            hidden=hidden,
+        )
     except pymongo.errors.OperationFailure:
         flask.abort(400, 'Malformed query')
 
-    return jsonify({
-        'total_count': cursor_count,
-        'pointers': list(map(
-            json_prepare,
-            cursor.skip(g.offset).limit(g.limit),
-        ))
-    })
-
 
 @app.route('/v1/process', methods=['GET'])
 def list_process():
     def add_form(xml):
         json_xml = xml.to_json()
-        forms = []
-        xmliter = iter(xml)
-        first_node = next(xmliter)
-        xmliter.parser.expandNode(first_node)
-
-        for form in first_node.getElementsByTagName('form'):
-            forms.append(form_to_dict(form))
-
-        json_xml['form_array'] = forms
+        json_xml['form_array'] = xml.get_form_array()
 
         return json_xml
 
@@ -670,15 +696,7 @@ def list_process():
 def find_process(name):
     def add_form(xml):
         json_xml = xml.to_json()
-        forms = []
-        xmliter = iter(xml)
-        first_node = next(xmliter)
-        xmliter.parser.expandNode(first_node)
-
-        for form in first_node.getElementsByTagName('form'):
-            forms.append(form_to_dict(form))
-
-        json_xml['form_array'] = forms
+        json_xml['form_array'] = xml.get_form_array()
 
         return json_xml
 
@@ -720,8 +738,7 @@ def xml_process(name):
                       .format(process_name),
             'where': 'request.body.process_name',
         }])
-    ruta = os.path.join(app.config['XML_PATH'], xml.filename)
-    return open(ruta).read(), {'Content-Type': 'text/xml; charset=utf-8'}
+    return xml.get_source(), {'Content-Type': 'text/xml; charset=utf-8'}
 
 
 @app.route('/v1/activity', methods=['GET'])
@@ -808,47 +825,25 @@ def task_read(id):
             node.getElementsByTagName('dep')
         ))
 
+        # the state is walked once, then each dep only visits the forms
+        # with its ref
+        forms_by_ref = index_valid_forms(state)
+
         fields = []
         for dep in deps:
             form_ref, input_name = dep.split('.')
 
-            # TODO this could be done in O(log N + K)
-            for node in state['state']['items'].values():
-                if node['state'] != 'valid':
+            for prefix, form in forms_by_ref.get(form_ref, []):
+                if input_name not in form['inputs']['items']:
                     continue
 
-                for identifier in node['actors']['items']:
-                    actor = node['actors']['items'][identifier]
-                    if actor['state'] != 'valid':
-                        continue
-
-                    for form_ix, form in enumerate(actor['forms']):
-                        if form['state'] != 'valid':
-                            continue
-
-                        if form['ref'] != form_ref:
-                            continue
-
-                        if input_name not in form['inputs']['items']:
-                            continue
-
-                        input = form['inputs']['items'][input_name]
-
-                        state_ref = [
-                            node['id'],
-                            identifier,
-                            str(form_ix),
-                        ]
-                        state_ref = '.'.join(state_ref)
-                        state_ref = state_ref + ':' + dep
-
-                        field = {
-                            'ref': state_ref,
-                            **input,
-                        }
-                        del field['state']
+                field = {
+                    'ref': prefix + ':' + dep,
+                    **form['inputs']['items'][input_name],
+                }
+                del field['state']
 
-                        fields.append(field)
+                fields.append(field)
 
         json_data['fields'] = fields
 
@@ -893,79 +888,31 @@ def data_mix():
     include_list = [s.strip() for s in include_fields.split(',') if s]
     include_map = {item: 1 for item in include_list}
 
-    prjct = {**include_map} or {**exclude_map}
-
-    # filter for exe_id
-    if exe_query.get('id'):
-        exe_id = {exe_query.get('id')}
-    else:
-        exe_id = None
+    prjct, hidden = cursor_projection({**include_map} or {**exclude_map})
 
-    # filter for user_identifier
+    # filter for user_identifier, executions the user has acted in or has
+    # a task in
     user_identifier = exe_query.pop('user_identifier', None)
     if user_identifier is not None:
-        user = User.get_by('identifier', user_identifier)
-        # early return
-        if user is None:
-            return jsonify({
-                'data': []
-            })
-
-        uid_exe_set = {
-            item.id for item in user.proxy.activities.get()
-        } | {
-            item.execution for item in user.proxy.tasks.get()
-        }
+        # the user's ongoing tasks are few and found with an index, their
+        # executions are matched by id so the other branch of the $or can
+        # use its index too. Looking up the pointers of every execution
+        # before matching would scan the whole collection
+        ptr_collection = mongo.db[app.config['POINTER_COLLECTION']]
 
-        if exe_id is not None:
-            exe_id &= uid_exe_set
-        else:
-            exe_id = uid_exe_set
+        exe_query.setdefault('$and', []).append({'$or': [
+            user_executions(user_identifier),
+            {'id': {'$in': ptr_collection.distinct(
+                'execution.id',
+                user_pointers(user_identifier),
+            )}},
+        ]})
 
-    # filter for actor_identifier
+    # filter for actor_identifier, the handler keeps the identifiers found
+    # in ``actors`` in an indexed list
     actor_identifier = exe_query.pop('actor_identifier', None)
     if actor_identifier is not None:
-        collection = mongo.db[app.config['EXECUTION_COLLECTION']]
-        cursor = collection.aggregate([
-            {
-                '$match': {
-                    'state.item_order': {
-                        '$exists': True,
-                        '$nin': [None, {}],
-                    },
-                    'actors': {
-                        '$exists': True,
-                    },
-                },
-            },
-            {
-                '$project': {
-                    '_id': 0,
-                    'id': 1,
-                    'state.item_order': 1,
-                    'actors': 1,
-                },
-            },
-        ])
-
-        aid_exe_set = set()
-        for doc in cursor:
-            key_list = doc['state']['item_order']
-            for key in key_list:
-                an_actor = doc['actors'].get(key)
-                if an_actor and an_actor == actor_identifier:
-                    aid_exe_set.add(doc['id'])
-
-        # early return
-        if not aid_exe_set:
-            return jsonify({
-                'data': []
-            })
-
-        if exe_id is not None:
-            exe_id &= aid_exe_set
-        else:
-            exe_id = aid_exe_set
+        exe_query['actor_identifiers'] = actor_identifier
 
     # filter for sorting
     sort_query = exe_query.pop('sort', None)
@@ -981,54 +928,7 @@ def data_mix():
         order = getattr(pymongo, order)
         srt = {'$sort': {key: order}}
     else:
-        srt = {'$sort': {'started_at': -1}}
-
-    # pipeline
-    # all special cases should be handled before this
-
-    # pointer's case
-    if ptr_query:
-        ptr_pipeline = [
-            {'$match': ptr_query},
-            {'$group': {
-                '_id': None,
-                'executions': {'$push': '$execution.id'},
-            }},
-        ]
-
-        ptr_collection = mongo.db[app.config['POINTER_COLLECTION']]
-        ptr_cursor = ptr_collection.aggregate(ptr_pipeline)
-
-        ptr_exe_ids = set()
-        for item in ptr_cursor:
-            ptr_exe_ids |= set(item['executions'])
-
-        if exe_id is not None:
-            exe_id &= ptr_exe_ids
-        else:
-            exe_id = ptr_exe_ids
-
-    if type(exe_id) == set:
-        exe_query['id'] = {
-            '$in': list(exe_id),
-        }
-
-    # execution's case
-    exe_pipeline = [
-        {'$match': exe_query},
-        {'$project': {
-            '_id': 0,
-            'id': 1,
-        }},
-    ]
-
-    exe_collection = mongo.db[app.config['EXECUTION_COLLECTION']]
-    exe_cursor = exe_collection.aggregate(exe_pipeline)
-
-    execution_ids = list(map(
-        lambda item: item['id'],
-        exe_cursor,
-    ))
+        srt = {'$sort': {'started_at': -1, 'id': 1}}
 
     # build results
     ptr_lookup = {
@@ -1038,18 +938,30 @@ def data_mix():
         'as': 'pointer',
     }
 
-    exe_pipeline = [
-        {'$match': {'id': {'$in': execution_ids}}},
-        {'$lookup': ptr_lookup},
-        {'$project': {'pointer.execution': 0}},
-        srt,
-        {'$skip': g.offset},
-        {'$limit': g.limit},
-    ]
+    match = [{'$match': after(exe_query, sort_query)}]
+    page = [srt, {'$skip': g.offset}, {'$limit': g.limit}]
+    lookup = [{'$lookup': ptr_lookup}]
+
+    # pointer.* filters keep the executions with a matching pointer
+    if ptr_query:
+        lookup.append({'$match': {'pointer': {'$elemMatch': ptr_query}}})
+
+    lookup.append({'$project': {'pointer.execution': 0}})
+
+    # filtering or sorting by a pointer's field needs the pointers of every
+    # execution, otherwise only the ones in this page are looked up
+    if ptr_query or any(
+        key.split('.')[0] == 'pointer' for key in srt['$sort']
+    ):
+        exe_pipeline = match + lookup + page
+    else:
+        exe_pipeline = match + page + lookup
 
     if prjct:
         exe_pipeline.append({'$project': prjct})
 
+    exe_collection = mongo.db[app.config['EXECUTION_COLLECTION']]
+
     def data_mix_json_prepare(obj):
         if 'pointer' in obj and obj['pointer']:
             obj['pointer'] = json_prepare(obj['pointer'][-1])
@@ -1058,12 +970,15 @@ def data_mix():
             obj.pop('pointer', None)
         return json_prepare(obj)
 
-    return jsonify({
-        'data': list(map(
-            data_mix_json_prepare,
-            exe_collection.aggregate(exe_pipeline, allowDiskUse=True),
-        ))
-    })
+    return stream_listing(
+        exe_collection.aggregate(
+            exe_pipeline,
+            allowDiskUse=True,
+            batchSize=app.config['PAGINATION_BATCH_SIZE'],
+        ),
+        prepare=data_mix_json_prepare,
+        hidden=hidden,
+    )
 
 
 @app.route('/v1/log', methods=['GET'])
@@ -1081,14 +996,9 @@ def all_logs():
     # filter for user_identifier
     user_identifier = query.pop('user_identifier', None)
     if user_identifier is not None:
-        user = User.get_by('identifier', user_identifier)
-        if user is not None:
-            pointer_list = [item.id for item in user.proxy.tasks.get()]
-        else:
-            pointer_list = []
-        query['id'] = {
-            '$in': pointer_list,
-        }
+        query.setdefault('$and', []).append(
+            user_pointers(user_identifier)
+        )
 
     pipeline = [
         {'$match': query},
@@ -1098,17 +1008,16 @@ def all_logs():
             'latest': {'$first': '$$ROOT'},
         }},
         {'$replaceRoot': {'newRoot': '$latest'}},
-        {'$sort': {'started_at': -1}},
+        {'$match': after({})},
+        {'$sort': {'started_at': -1, 'id': 1}},
         {'$skip': g.offset},
         {'$limit': g.limit},
     ]
 
-    return jsonify({
-        'data': list(map(
-            json_prepare,
-            collection.aggregate(pipeline),
-        )),
-    })
+    return stream_listing(collection.aggregate(
+        pipeline,
+        batchSize=app.config['PAGINATION_BATCH_SIZE'],
+    ))
 
 
 @app.route('/v1/log/<id>', methods=['GET'])
@@ -1121,14 +1030,12 @@ def list_logs(id):
     if node_id:
         query['node.id'] = node_id
 
-    return jsonify({
-        "data": list(map(
-            json_prepare,
-            collection.find(query).skip(g.offset).limit(g.limit).sort([
-                ('started_at', pymongo.DESCENDING)
-            ])
-        )),
-    })
+    return stream_listing(
+        collection.find(after(query)).skip(g.offset).limit(g.limit).sort([
+            ('started_at', pymongo.DESCENDING),
+            ('id', pymongo.ASCENDING),
+        ]).batch_size(app.config['PAGINATION_BATCH_SIZE'])
+    )
 
 
 @app.route('/v1/process/<id>/statistics', methods=['GET'])
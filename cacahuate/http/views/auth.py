@@ -2,9 +2,9 @@ from flask import request, jsonify
 from random import choice
 from string import ascii_letters
 
-from cacahuate.http.errors import Unauthorized
+from cacahuate.http.middleware import authenticate, forget_user
 from cacahuate.http.wsgi import app
-from cacahuate.models import User, Token, get_or_create_user
+from cacahuate.models import Token, get_or_create_user
 
 
 @app.route('/v1/auth/signin/<AuthProvider:backend>', methods=['POST'])
@@ -22,6 +22,8 @@ def signin(backend):
         token = Token(token=token).save()
         token.proxy.user.set(user)
 
+    forget_user(user.identifier)
+
     return jsonify({
         'data': {
             'username': user.identifier,
@@ -33,19 +35,10 @@ def signin(backend):
 
 @app.route('/v1/auth/whoami')
 def whoami():
-    identifier = request.authorization['username']
-    token = request.authorization['password']
-
-    user = User.get_by('identifier', identifier)
-    token = Token.get_by('token', token)
-
-    if user is None or \
-       token is None or \
-       token.proxy.user.get().id != user.id:
-        raise Unauthorized([{
-            'detail': 'Your credentials are invalid, sorry',
-            'where': 'request.authorization',
-        }])
+    user = authenticate(
+        request.authorization['username'],
+        request.authorization['password'],
+    )
 
     return jsonify({
         'data': user.to_json(),
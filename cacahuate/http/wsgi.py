@@ -11,6 +11,7 @@ from yuid import yuid
 from cacahuate.indexes import create_indexes
 from cacahuate.models import bind_models
 from cacahuate.http.mongo import mongo
+from cacahuate import rabbit
 
 # The flask application
 app = Flask(__name__)
@@ -36,6 +37,9 @@ bind_models(cora._engine)
 mongo.init_app(app)
 create_indexes(app.config)
 
+# Rabbitmq channels
+rabbit.init_app(app)
+
 # Url converters
 import cacahuate.http.converters  # noqa
 
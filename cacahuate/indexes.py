@@ -1,17 +1,153 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+import logging
 
+LOGGER = logging.getLogger(__name__)
 
-def create_indexes(config):
-    # Create index
+# Indexes needed by the queries made by the api and the handler, by the
+# setting that names the collection. Each one is a (keys, options) pair
+INDEXES = {
+    'EXECUTION_COLLECTION': [
+        # lookups by id, /v1/execution?id= and the whole handler
+        ([('id', ASCENDING)], {'unique': True}),
+        # default sort of /v1/execution and /v1/inbox, ties broken by id
+        ([('started_at', DESCENDING), ('id', ASCENDING)], {}),
+        ([('finished_at', ASCENDING)], {}),
+        # /v1/execution?status= and /v1/process/statistics
+        ([
+            ('status', ASCENDING),
+            ('started_at', DESCENDING),
+            ('id', ASCENDING),
+        ], {}),
+        # /v1/execution?process_name=
+        ([
+            ('process_name', ASCENDING),
+            ('started_at', DESCENDING),
+            ('id', ASCENDING),
+        ], {}),
+        # /v1/inbox?actor_identifier=
+        ([('actor_identifiers', ASCENDING)], {}),
+        # ?user_identifier= in /v1/execution and /v1/inbox
+        ([
+            ('actor_list.actor.identifier', ASCENDING),
+            ('status', ASCENDING),
+        ], {}),
+    ],
+    'POINTER_COLLECTION': [
+        # lookups by id, /v1/pointer/<id> and ?user_identifier= filters
+        ([('id', ASCENDING)], {}),
+        # /v1/log/<id>, sorted by start
+        ([
+            ('execution.id', ASCENDING),
+            ('started_at', DESCENDING),
+            ('id', ASCENDING),
+        ], {}),
+        # ongoing pointers of an execution, refreshed and cancelled by the
+        # handler
+        ([('execution.id', ASCENDING), ('state', ASCENDING)], {}),
+        # default sort of /v1/pointer and /v1/log, ties broken by id
+        ([('started_at', DESCENDING), ('id', ASCENDING)], {}),
+        ([('finished_at', ASCENDING)], {}),
+        # /v1/pointer?state=
+        ([
+            ('state', ASCENDING),
+            ('started_at', DESCENDING),
+            ('id', ASCENDING),
+        ], {}),
+        # /v1/process/<id>/statistics and /v1/log?process_id=
+        ([('process_id', ASCENDING), ('node.id', ASCENDING)], {}),
+        # ?user_identifier= in /v1/pointer, /v1/log and /v1/inbox, also
+        # /v1/pointer?notified_users.identifier=
+        ([
+            ('notified_users.identifier', ASCENDING),
+            ('state', ASCENDING),
+        ], {}),
+        # /v1/pointer?actor_list.actor.identifier=
+        ([('actor_list.actor.identifier', ASCENDING)], {}),
+    ],
+}
+
+# Indexes created by previous versions, either unused or covered by one of
+# the compound indexes above. They are dropped by ``migrate``
+OBSOLETE_INDEXES = {
+    'EXECUTION_COLLECTION': [
+        'status_1',
+        'started_at_1',
+    ],
+    'POINTER_COLLECTION': [
+        # pointers have a state, not a status
+        'status_1',
+        'execution.id_1',
+        'started_at_1',
+        'notified_users.identifier_1',
+    ],
+}
+
+
+def fill_actor_identifiers(collection):
+    ''' executions started before ``actor_identifiers`` existed only have
+    their ``actors`` '''
+    requests = []
+
+    for execution in collection.find({
+        'actor_identifiers': {'$exists': False},
+    }, {'id': 1, 'actors': 1}):
+        requests.append(UpdateOne({'_id': execution['_id']}, {'$set': {
+            'actor_identifiers': sorted(set(
+                (execution.get('actors') or {}).values()
+            )),
+        }}))
+
+        if len(requests) == 1000:
+            collection.bulk_write(requests, ordered=False)
+            requests = []
+
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+
+
+def get_db(config):
     mongo = MongoClient(config['MONGO_URI'])
-    db = getattr(mongo, config['MONGO_DBNAME'])
 
-    db.execution.create_index("id", unique=True)
-    db.execution.create_index("status")
-    db.execution.create_index("started_at")
-    db.execution.create_index("finished_at")
+    return getattr(mongo, config['MONGO_DBNAME'])
+
+
+def drop_obsolete_indexes(db, config):
+    for setting, names in OBSOLETE_INDEXES.items():
+        collection = db[config[setting]]
+        existing = collection.index_information()
+
+        for name in names:
+            if name in existing:
+                collection.drop_index(name)
+
+
+def create_indexes(config):
+    ''' creates the indexes in ``INDEXES``, safe to call every time cacahuate
+    starts. Never drops an index, a previous version might still be running
+    and using it '''
+    db = get_db(config)
+
+    for setting, indexes in INDEXES.items():
+        collection = db[config[setting]]
+
+        for keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except OperationFailure as e:
+                # an index with the same keys or name but other options was
+                # created by hand, leave it as it is
+                if e.code not in (85, 86):
+                    raise
+
+                LOGGER.warning('Index {} not created: {}'.format(keys, e))
+
+
+def migrate(config):
+    ''' brings the database of a previous version up to date. Run it once
+    after every instance of the previous version has stopped '''
+    db = get_db(config)
 
-    db.pointer.create_index("status")
-    db.pointer.create_index("execution.id")
-    db.pointer.create_index("started_at")
-    db.pointer.create_index("finished_at")
+    drop_obsolete_indexes(db, config)
+    fill_actor_identifiers(db[config['EXECUTION_COLLECTION']])
+    create_indexes(config)
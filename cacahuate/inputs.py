@@ -1,4 +1,3 @@
-from case_conversion import pascalcase
 from datetime import datetime
 from functools import reduce
 from operator import and_
@@ -6,12 +5,11 @@ import ast
 import re
 import numbers
 
-from jsonpath_rw import parse as jsonpathparse
-
 from cacahuate.errors import InvalidInputError, RequiredListError
 from cacahuate.errors import MisconfiguredProvider, RequiredIntError
 from cacahuate.errors import RequiredFloatError, RequiredStrError
 from cacahuate.errors import RequiredInputError, InvalidDateError
+from cacahuate.jsonpath import parse_path
 from cacahuate.xml import get_text
 
 INPUTS = [
@@ -202,17 +200,19 @@ class FiniteOptionInput(Input):
                 if ref_attr:
                     ref_type, ref_path = ref_attr.split('#')
                     if ref_type == 'form':
-                        if not len(jsonpathparse(ref_path).find(context)):
+                        found = parse_path(ref_path).find(context)
+
+                        if not len(found):
                             continue
 
-                        label_path = opt.getAttribute('label')
-                        value_path = opt.getAttribute('value')
+                        label_path = parse_path(opt.getAttribute('label'))
+                        value_path = parse_path(opt.getAttribute('value'))
 
-                        match = jsonpathparse(ref_path).find(context)[0].value.all()
+                        match = found[0].value.all()
                         for localdata in match:
                             self.options.append(Option(
-                                jsonpathparse(label_path).find(localdata)[0].value,
-                                jsonpathparse(value_path).find(localdata)[0].value,
+                                label_path.find(localdata)[0].value,
+                                value_path.find(localdata)[0].value,
                             ))
 
                 else:
@@ -460,6 +460,32 @@ class LinkInput(Input):
         return curated
 
 
+# Classes built by make_input, by the value of the ``type`` attribute
+INPUT_CLASSES = {
+    'text': TextInput,
+    'password': PasswordInput,
+    'checkbox': CheckboxInput,
+    'radio': RadioInput,
+    'file': FileInput,
+    'datetime': DatetimeInput,
+    'date': DateInput,
+    'select': SelectInput,
+    'int': IntInput,
+    'float': FloatInput,
+    'link': LinkInput,
+    'currency': CurrencyInput,
+}
+
+
+def register_input(type, cls):
+    ''' makes ``make_input`` build inputs of the given type as instances of
+    ``cls``, a subclass of ``Input`` '''
+    INPUT_CLASSES[type] = cls
+
+    if type not in INPUTS:
+        INPUTS.append(type)
+
+
 def make_input(element, context=None):
     ''' returns a build Input object given an Element object '''
     classattr = element.getAttribute('type')
@@ -467,12 +493,11 @@ def make_input(element, context=None):
     if not context:
         context = {}
 
-    if classattr not in INPUTS:
+    try:
+        cls = INPUT_CLASSES[classattr]
+    except KeyError:
         raise ValueError(
             'Class definition not found for input: {}'.format(classattr)
         )
 
-    class_name = pascalcase(classattr) + 'Input'
-    available_classes = __import__(__name__).inputs
-
-    return getattr(available_classes, class_name)(element, context)
+    return cls(element, context)
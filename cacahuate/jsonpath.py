@@ -0,0 +1,13 @@
+from functools import lru_cache
+from jsonpath_rw import parse
+
+# how many distinct jsonpath expressions are kept parsed
+PATH_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def parse_path(expression):
+    ''' returns the parsed jsonpath expression. Parsing builds a whole parser
+    each time, while the parsed expression can be reused to find values in
+    any number of documents '''
+    return parse(expression)
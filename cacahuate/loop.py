@@ -1,12 +1,15 @@
 import logging
 import traceback
+import zlib
 from threading import Thread
 from queue import Queue
 from functools import partial
 
 import pika
+import simplejson as json
 
 from .handler import Handler
+from .models import Pointer
 
 LOGGER = logging.getLogger(__name__)
 
@@ -60,10 +63,62 @@ def handler_loop(connection, config, queue):
     LOGGER.info('Handler thread stopped')
 
 
-def handle_message(channel, method, properties, body, connection, queue):
+def get_execution_id(body):
+    ''' the id of the execution a message acts on, ``None`` if it can't be
+    known '''
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return None
+
+    if 'execution_id' in message:
+        return message['execution_id']
+
+    if 'pointer_id' not in message:
+        return None
+
+    # step messages only carry the pointer, read its execution straight from
+    # the pointer's hash
+    execution_id = Pointer.get_redis().hget(
+        '{}:{}:obj'.format(Pointer.cls_key(), message['pointer_id']),
+        'execution',
+    )
+
+    if isinstance(execution_id, bytes):
+        execution_id = execution_id.decode('utf8')
+
+    return execution_id
+
+
+def choose_queue(queues, body):
+    ''' all the messages of an execution go to the same worker so they are
+    processed in the order they arrived '''
+    if len(queues) == 1:
+        return queues[0]
+
+    key = get_execution_id(body) or ''
+
+    return queues[zlib.crc32(key.encode('utf8')) % len(queues)]
+
+
+def handle_message(channel, method, properties, body, connection, queues):
+    queue = choose_queue(queues, body)
+
     queue.put((False, (channel, method, properties, body)))
 
 
+def log_queue_depth(connection, queues, interval):
+    ''' periodically logs how many messages wait to be processed '''
+    depths = [queue.qsize() for queue in queues]
+
+    LOGGER.info('Queue depth: {} {}'.format(sum(depths), depths))
+
+    connection.call_later(
+        interval,
+        partial(log_queue_depth, connection, queues, interval),
+    )
+
+
 def start(config):
     # Setup the amqp protocol
     connection = pika.BlockingConnection(pika.ConnectionParameters(
@@ -82,18 +137,39 @@ def start(config):
     )
     LOGGER.info('Declared queue {}'.format(config['RABBIT_QUEUE']))
 
-    # Setup a thread for processing messages
-    queue = Queue()
-
-    thread = Thread(target=partial(handler_loop, connection, config, queue))
-
-    # Start the thread
-    thread.start()
+    # Limit the unacknowledged messages rabbitmq sends to this consumer, the
+    # rest wait in rabbitmq instead of this process' memory
+    channel.basic_qos(prefetch_count=config['RABBIT_PREFETCH_COUNT'])
+
+    # Setup the threads for processing messages, each one with its own queue.
+    # A queue never holds more than the prefetched messages
+    queues = [
+        Queue(maxsize=config['RABBIT_PREFETCH_COUNT'])
+        for i in range(config['HANDLER_WORKERS'])
+    ]
+    threads = [
+        Thread(target=partial(handler_loop, connection, config, queue))
+        for queue in queues
+    ]
+
+    # Start the threads
+    for thread in threads:
+        thread.start()
+
+    LOGGER.info('Started {} handler threads'.format(len(threads)))
+
+    if config['QUEUE_STATS_INTERVAL']:
+        connection.call_later(config['QUEUE_STATS_INTERVAL'], partial(
+            log_queue_depth,
+            connection,
+            queues,
+            config['QUEUE_STATS_INTERVAL'],
+        ))
 
     # Attach a handler to the consumer loop
     channel.basic_consume(
         config['RABBIT_QUEUE'],
-        partial(handle_message, connection=connection, queue=queue),
+        partial(handle_message, connection=connection, queues=queues),
         consumer_tag=config['RABBIT_CONSUMER_TAG'],
     )
 
@@ -103,8 +179,11 @@ def start(config):
         channel.start_consuming()
     except KeyboardInterrupt:
         LOGGER.info('cacahuate stopped')
-        queue.put((True, (None, None, None, None)))
+        for queue in queues:
+            queue.put((True, (None, None, None, None)))
         channel.stop_consuming()
-        thread.join()
+
+        for thread in threads:
+            thread.join()
 
     connection.close()
@@ -16,20 +16,26 @@ import time
 
 from cacahuate.errors import MalformedProcess
 from cacahuate.grammar import Condition
-from cacahuate.indexes import create_indexes
+from cacahuate.indexes import create_indexes, migrate as migrate_db
 from cacahuate.loop import start as loop
 from cacahuate.models import bind_models
 from cacahuate.xml import NODES, get_text
 
 
-def main():
-    # Load the config
+def load_config():
     config = Config(os.path.dirname(os.path.realpath(__file__)))
     config.from_object('cacahuate.settings')
 
     if os.getenv('CACAHUATE_SETTINGS'):
         config.from_envvar('CACAHUATE_SETTINGS', silent=False)
 
+    return config
+
+
+def main():
+    # Load the config
+    config = load_config()
+
     # Set the timezone
     os.environ['TZ'] = config['TIMEZONE']
     time.tzset()
@@ -53,6 +59,15 @@ def main():
     loop(config)
 
 
+def migrate():
+    ''' updates the database after upgrading cacahuate '''
+    config = load_config()
+
+    logging.config.dictConfig(config['LOGGING'])
+
+    migrate_db(config)
+
+
 def rng_path():
     print(os.path.abspath(os.path.join(
         os.path.dirname(__file__),
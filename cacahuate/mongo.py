@@ -1,5 +1,7 @@
 from datetime import datetime
 
+from pymongo.collection import Collection
+
 from cacahuate.jsontypes import MultiFormDict, Map
 
 DATE_FIELDS = [
@@ -58,3 +60,108 @@ def pointer_entry(node, name, description, execution, pointer, notified_users=No
         'notified_users': notified_users or [],
         'state': 'ongoing',
     }
+
+
+# collection methods that make a round trip to the server
+READ_METHODS = frozenset([
+    'aggregate',
+    'count',
+    'count_documents',
+    'distinct',
+    'find',
+    'find_one',
+])
+WRITE_METHODS = frozenset([
+    'bulk_write',
+    'delete_many',
+    'delete_one',
+    'find_one_and_delete',
+    'find_one_and_replace',
+    'find_one_and_update',
+    'insert_many',
+    'insert_one',
+    'replace_one',
+    'update_many',
+    'update_one',
+])
+
+
+class HandlerCollection:
+    ''' Wraps a collection counting the reads and writes made through it.
+    Writes deferred on it are sent before any other call so they keep their
+    order and can be read back '''
+
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+        self._collection = db.get_database()[name]
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+
+        if name in READ_METHODS:
+            kind = 'reads'
+        elif name in WRITE_METHODS:
+            kind = 'writes'
+        else:
+            return attr
+
+        def call(*args, **kwargs):
+            self._db.flush(self._name)
+            self._db.counts[kind] += 1
+
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class HandlerDatabase:
+    ''' Wraps the database used by the handler. Calls made to its
+    collections are counted in ``counts`` to measure the round trips a message
+    takes, and writes passed to ``defer`` are sent together in a single
+    ``bulk_write`` per collection when ``flush`` is called '''
+
+    def __init__(self, db):
+        self._db = db
+        self.pending = dict()
+        self.counts = {
+            'reads': 0,
+            'writes': 0,
+        }
+
+    def get_database(self):
+        return self._db
+
+    def reset(self):
+        self.counts['reads'] = 0
+        self.counts['writes'] = 0
+
+    def defer(self, name, operation):
+        ''' queues a write (``UpdateOne``, ``InsertOne``...) for the given
+        collection '''
+        self.pending.setdefault(name, []).append(operation)
+
+    def flush(self, name=None):
+        ''' sends the deferred writes of a collection, or of all of them,
+        in the order they were deferred '''
+        names = [name] if name is not None else list(self.pending)
+
+        for name in names:
+            operations = self.pending.pop(name, None)
+
+            if not operations:
+                continue
+
+            self.counts['writes'] += 1
+            self._db[name].bulk_write(operations, ordered=True)
+
+    def __getitem__(self, name):
+        return HandlerCollection(self, name)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+
+        if isinstance(attr, Collection):
+            return HandlerCollection(self, attr.name)
+
+        return attr
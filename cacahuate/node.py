@@ -1,23 +1,26 @@
 ''' This file defines some basic classes that map the behaviour of the
 equivalent xml nodes '''
-from case_conversion import pascalcase
-from jinja2 import Template, TemplateError
+from jinja2 import TemplateError
+from pymongo import ReturnDocument
 import logging
 import re
 import requests
-from jsonpath_rw import parse as jsonpathparse
 import json
+from urllib.parse import urlparse
 
 from cacahuate.errors import InconsistentState, MisconfiguredProvider
 from cacahuate.errors import InvalidInputError, InputError, RequiredListError
 from cacahuate.errors import RequiredDictError
 from cacahuate.errors import ValidationErrors, RequiredInputError, EndOfProcess
-from cacahuate.grammar import Condition, ConditionTransformer
+from cacahuate.grammar import Condition
 from cacahuate.http.errors import BadRequest
 from cacahuate.inputs import make_input
+from cacahuate.jsonpath import parse_path
 from cacahuate.jsontypes import Map, SortedMap
 from cacahuate.mongo import make_context
-from cacahuate.templates import render_or
+from cacahuate.dispatch import get_dispatcher
+from cacahuate.sessions import get_session, get_timeout
+from cacahuate.templates import render_or, get_template
 from cacahuate.models import get_or_create_user
 from cacahuate.imports import user_import
 from cacahuate.xml import get_text, NODES, Xml
@@ -115,13 +118,38 @@ class Node:
 
     def next(self, xml, state, mongo, config, *, skip_reverse=False):
         # Return next node by simple adjacency
-        xmliter = iter(xml)
-        xmliter.find(lambda e: e.getAttribute('id') == self.id)
-
-        return make_node(xmliter.next_skipping_elifelse(), xmliter)
+        return xml.get_graph().next_of(self.id)
+
+    def next_with_state(self, xml, state, mongo, config, *,
+                        skip_reverse=False):
+        ''' returns the next node and the state of the execution after
+        moving to it, which only changes if moving writes to it '''
+        return self.next(
+            xml, state, mongo, config, skip_reverse=skip_reverse,
+        ), state
+
+    def dependent_fields(self):
+        ''' returns the fields of this node computed from other fields as a
+        list of ``(dependency, form, input)`` tuples, where ``dependency`` is
+        the ``form.input`` it depends on or None if the field must always be
+        invalidated. Used to build the dependency graph of the process '''
+        return []
 
     def dependent_refs(self, invalidated, node_state):
-        raise NotImplementedError('Must be implemented in subclass')
+        ''' finds dependencies of the invalidated set in this node '''
+        deprefs = set(ref.split(':')[1] for ref in invalidated)
+        actor = next(iter(node_state['actors']['items'].keys()))
+
+        return set(
+            '{node}.{actor}.0:{form}.{input}'.format(
+                node=self.id,
+                actor=actor,
+                form=form,
+                input=input,
+            )
+            for dep, form, input in self.dependent_fields()
+            if dep is None or dep in deprefs
+        )
 
     def in_state(self, ref, node_state):
         ''' returns true if this ref is part of this state '''
@@ -326,26 +354,13 @@ class Action(UserAttachedNode):
     def is_async(self):
         return True
 
-    def dependent_refs(self, invalidated, node_state):
-        ''' finds dependencies of the invalidated set in this node '''
-        refs = set()
-        actor = next(iter(node_state['actors']['items'].keys()))
-
-        for dep in invalidated:
-            _, depref = dep.split(':')
-
-            for form in self.form_array:
-                for field in form.inputs:
-                    for dep in field.dependencies:
-                        if depref == dep:
-                            refs.add('{node}.{actor}.0:{form}.{input}'.format(
-                                node=self.id,
-                                actor=actor,
-                                form=form.ref,
-                                input=field.name,
-                            ))
-
-        return refs
+    def dependent_fields(self):
+        return [
+            (dep, form.ref, field.name)
+            for form in self.form_array
+            for field in form.inputs
+            for dep in field.dependencies
+        ]
 
     def validate_form_spec(self, form_specs, associated_data) -> dict:
         ''' Validates the given data against the spec contained in form.
@@ -458,10 +473,16 @@ class Validation(UserAttachedNode):
         return True
 
     def next(self, xml, state, mongo, config, *, skip_reverse=False):
+        return self.next_with_state(
+            xml, state, mongo, config, skip_reverse=skip_reverse,
+        )[0]
+
+    def next_with_state(self, xml, state, mongo, config, *,
+                        skip_reverse=False):
         context = make_context(state, config)
 
         if skip_reverse or context[self.id]['response'] == 'accept':
-            return super().next(xml, state, mongo, config)
+            return super().next(xml, state, mongo, config), state
 
         state_updates = cascade_invalidate(
             xml,
@@ -470,20 +491,17 @@ class Validation(UserAttachedNode):
             context[self.id]['comment']
         )
 
-        # update state
+        # update state and get it back in the same call
         collection = mongo[config['EXECUTION_COLLECTION']]
-        collection.update_one({
+        state = collection.find_one_and_update({
             'id': state['id'],
         }, {
             '$set': state_updates,
-        })
-
-        # reload state
-        state = next(collection.find({'id': state['id']}))
+        }, return_document=ReturnDocument.AFTER)
 
         first_invalid_node = track_next_node(xml, state, mongo, config)
 
-        return first_invalid_node
+        return first_invalid_node, state
 
     def validate_field(self, field, index):
         if type(field) != dict:
@@ -579,19 +597,11 @@ class Validation(UserAttachedNode):
             },
         ])]
 
-    def dependent_refs(self, invalidated, node_state):
-        ''' finds dependencies of the invalidated set in this node '''
-        refs = set()
-        actor = next(iter(node_state['actors']['items'].keys()))
-
-        for inref in invalidated:
-            if self.in_dependencies(inref):
-                refs.add('{node}.{actor}.0:approval.response'.format(
-                    node=self.id,
-                    actor=actor,
-                ))
-
-        return refs
+    def dependent_fields(self):
+        return [
+            (dep, 'approval', 'response')
+            for dep in self.dependencies
+        ]
 
 
 class CallFormInput(Node):
@@ -675,9 +685,6 @@ class Call(FullyContainedNode):
 
         return []
 
-    def dependent_refs(self, invalidated, node_state):
-        return set()
-
 
 class Exit(FullyContainedNode):
     ''' A node that kills an execution with some status '''
@@ -708,25 +715,25 @@ class Conditional(Node):
 
         self.condition = xmliter.get_next_condition()
 
+        # compiled lazily, nodes live as long as their process graph
+        self._evaluate = None
+
     def is_async(self):
         return False
 
     def next(self, xml, state, mongo, config, *, skip_reverse=False):
-        xmliter = iter(xml)
-
-        # consume up to this node
-        ifnode = xmliter.find(lambda e: e.getAttribute('id') == self.id)
-
-        if not make_context(state, config)[self.id]['condition']:
-            xmliter.expand(ifnode)
-
-        return make_node(xmliter.next_skipping_elifelse(), xmliter)
+        # skip this node's block if the condition was not met
+        return xml.get_graph().next_of(
+            self.id,
+            skip_block=not make_context(state, config)[self.id]['condition'],
+        )
 
     def work(self, config, state, channel, mongo):
-        tree = Condition().parse(self.condition)
+        if self._evaluate is None:
+            self._evaluate = Condition().compile(self.condition)
 
         try:
-            value = ConditionTransformer(make_context(state, config)).transform(tree)
+            value = self._evaluate(make_context(state, config))
         except ValueError as e:
             raise InconsistentState('Could not evaluate condition: {}'.format(
                 str(e)
@@ -742,15 +749,10 @@ class Conditional(Node):
             }
         ])]
 
-    def dependent_refs(self, invalidated, node_state):
+    def dependent_fields(self):
         ''' IF nodes should alwas be invalidated in case the value they depend
-        on changes, so this function just returns this node's ref'''
-        actor = next(iter(node_state['actors']['items'].keys()))
-
-        return {'{node}.{actor}.0:approval.condition'.format(
-            node=self.id,
-            actor=actor,
-        )}
+        on changes, so their condition doesn't depend on a specific field '''
+        return [(None, 'approval', 'condition')]
 
 
 class If(Conditional):
@@ -787,15 +789,10 @@ class Else(Node):
             },
         ])]
 
-    def dependent_refs(self, invalidated, node_state):
+    def dependent_fields(self):
         ''' ELSE nodes should alwas be invalidated in case the value they depend
-        on changes, so this function just returns this node's ref'''
-        actor = next(iter(node_state['actors']['items'].keys()))
-
-        return {'{node}.{actor}.0:approval.condition'.format(
-            node=self.id,
-            actor=actor,
-        )}
+        on changes, so their condition doesn't depend on a specific field '''
+        return [(None, 'approval', 'condition')]
 
 
 class CaptureValue:
@@ -813,7 +810,7 @@ class CaptureValue:
             path = self.path
 
         try:
-            value = jsonpathparse(path).find(data)[0].value
+            value = parse_path(path).find(data)[0].value
         except IndexError:
             raise ValueError('Could not match value')
 
@@ -851,7 +848,7 @@ class Capture:
 
     def capture_multiple(self, data):
         try:
-            match = jsonpathparse(self.path).find(data)[0]
+            match = parse_path(self.path).find(data)[0]
         except IndexError:
             raise ValueError('Did not find a match with that path')
 
@@ -914,22 +911,50 @@ class Request(FullyContainedNode):
             for dep_node in deps_node[0].getElementsByTagName('dep'):
                 self.dependencies.append(get_text(dep_node))
 
-    def make_request(self, context):
+        # Connection settings, override the ones in the config
+        timeout = element.getAttribute('timeout')
+        self.timeout = float(timeout) if timeout else None
+
+        retries = element.getAttribute('retries')
+        self.retries = int(retries) if retries else None
+
+        # run the request in the background instead of the handler's thread
+        self.run_async = element.getAttribute('async') == 'true'
+
+        # compiled lazily, nodes live as long as their process graph
+        self._templates = None
+
+    def get_templates(self):
+        ''' returns the compiled templates of the url, body and headers '''
+        if self._templates is None:
+            self._templates = (
+                get_template(self.url),
+                get_template(self.body),
+                [(name, get_template(value)) for name, value in self.headers],
+            )
+
+        return self._templates
+
+    def make_request(self, context, config):
         data_forms = []
 
         try:
-            url = Template(self.url).render(**context)
-            body = Template(self.body).render(**context)
-            headers = dict(map(
-                lambda t: (t[0], Template(t[1]).render(**context)),
-                self.headers
-            ))
+            url_template, body_template, header_templates = \
+                self.get_templates()
+
+            url = url_template.render(**context)
+            body = body_template.render(**context)
+            headers = dict(
+                (name, template.render(**context))
+                for name, template in header_templates
+            )
 
-            response = requests.request(
+            response = get_session(config, self.retries).request(
                 self.method,
                 url,
                 headers=headers,
-                data=body
+                data=body,
+                timeout=get_timeout(config, self.timeout),
             )
 
             data_forms.append({
@@ -982,7 +1007,10 @@ class Request(FullyContainedNode):
                     }
                 ],
             })
-        except requests.exceptions.ConnectionError as e:
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as e:
             data_forms.append({
                 'id': self.id,
                 'items': [
@@ -1005,9 +1033,36 @@ class Request(FullyContainedNode):
 
         return data_forms
 
+    def get_host(self, context):
+        ''' the host the request is sent to, used to limit the concurrent
+        requests to the same server '''
+        try:
+            return urlparse(self.get_templates()[0].render(**context)).netloc
+        except TemplateError:
+            return ''
+
+    def dispatch(self, config, state, pointer_id):
+        ''' makes the request in the background, its forms are queued as the
+        input of the given pointer once it finishes '''
+        context = make_context(state, config)
+
+        def job():
+            get_dispatcher(config).publish({
+                'command': 'step',
+                'pointer_id': pointer_id,
+                'user_identifier': '__system__',
+                'input': self.make_forms(self.make_request(context, config)),
+            })
+
+        get_dispatcher(config).submit(self.get_host(context), job)
+
     def work(self, config, state, channel, mongo):
-        data_forms = self.make_request(make_context(state, config))
+        return self.make_forms(
+            self.make_request(make_context(state, config), config)
+        )
 
+    def make_forms(self, data_forms):
+        ''' builds the step input from the forms of the response '''
         return [
             Form.state_json(data_form['id'], [
                 {
@@ -1025,45 +1080,49 @@ class Request(FullyContainedNode):
         ]
 
     def is_async(self):
-        return False
+        return self.run_async
 
-    def in_dependencies(self, ref):
-        node, user, form, field = ref.split('.')
-        index, ref = form.split(':')
-        fref = ref + '.' + field
+    def dependent_fields(self):
+        return [
+            (dep, self.id, 'status_code')
+            for dep in self.dependencies
+        ]
 
-        for dep in self.dependencies:
-            if dep == fref:
-                return True
 
-        return False
+# Classes built by make_node, by tag name
+NODE_CLASSES = {
+    'action': Action,
+    'validation': Validation,
+    'exit': Exit,
+    'if': If,
+    'elif': Elif,
+    'else': Else,
+    'request': Request,
+    'call': Call,
+}
 
-    def dependent_refs(self, invalidated, node_state):
-        ''' finds dependencies of the invalidated set in this node '''
-        refs = set()
-        actor = next(iter(node_state['actors']['items'].keys()))
 
-        for inref in invalidated:
-            if self.in_dependencies(inref):
-                refs.add('{node}.{actor}.0:{node}.status_code'.format(
-                    node=self.id,
-                    actor=actor,
-                ))
+def register_node(tag, cls):
+    ''' makes ``make_node`` build the elements with the given tag as instances
+    of ``cls``, a subclass of ``Node``. Must be called before the processes
+    using the tag are loaded '''
+    NODE_CLASSES[tag] = cls
 
-        return refs
+    # so the tag is also found while iterating a process
+    if tag not in NODES:
+        NODES.append(tag)
 
 
 def make_node(element, xmliter, context=None) -> Node:
+    ''' returns a build Node object given an Element object '''
     if not context:
         context = {}
 
-    ''' returns a build Node object given an Element object '''
-    if element.tagName not in NODES:
+    try:
+        cls = NODE_CLASSES[element.tagName]
+    except KeyError:
         raise ValueError(
             'Class definition not found for node: {}'.format(element.tagName)
         )
 
-    class_name = pascalcase(element.tagName)
-    available_classes = __import__(__name__).node
-
-    return getattr(available_classes, class_name)(element, xmliter, context)
+    return cls(element, xmliter, context)
@@ -1,23 +1,128 @@
+''' Rabbitmq channels used by the http api. Opening a connection costs a full
+AMQP handshake, so channels are kept open in a pool shared by the threads of
+the process. Each request borrows one the first time it needs it and gives it
+back when its app context ends. '''
+from queue import LifoQueue, Empty, Full
+import logging
+import threading
+
 import pika
-from flask import g
+from flask import current_app, g
 
-from cacahuate.http.wsgi import app
+LOGGER = logging.getLogger(__name__)
 
 
-def get_channel():
-    channel = getattr(g, '_channel', None)
+class ChannelPool:
+    ''' Keeps at most ``RABBIT_POOL_SIZE`` idle channels. Channels are not
+    thread safe, so a channel belongs to a single thread between ``acquire``
+    and ``release``. '''
 
-    if channel is None:
+    def __init__(self, config):
+        self.config = config
+        self.idle = LifoQueue(maxsize=config['RABBIT_POOL_SIZE'])
+
+    def connect(self):
         connection = pika.BlockingConnection(pika.ConnectionParameters(
-            host=app.config['RABBIT_HOST'],
+            host=self.config['RABBIT_HOST'],
+            credentials=pika.PlainCredentials(
+                self.config['RABBIT_USER'],
+                self.config['RABBIT_PASS'],
+            ),
+            heartbeat=self.config['RABBIT_HEARTBEAT'],
         ))
         channel = connection.channel()
 
+        # declared once per connection instead of once per request
         channel.queue_declare(
-            queue=app.config['RABBIT_QUEUE'],
+            queue=self.config['RABBIT_QUEUE'],
             durable=True,
         )
 
-        g._channel = channel
+        if self.config['RABBIT_PUBLISHER_CONFIRMS']:
+            # basic_publish now waits for the broker and raises if the
+            # message was not accepted
+            channel.confirm_delivery()
+
+        return connection, channel
+
+    def is_healthy(self, connection, channel):
+        if connection.is_closed or channel.is_closed:
+            return False
+
+        try:
+            # idle connections don't answer heartbeats, this does it and
+            # notices if the broker closed the connection meanwhile
+            connection.process_data_events(time_limit=0)
+        except pika.exceptions.AMQPError:
+            return False
+
+        return channel.is_open
+
+    def close(self, connection):
+        try:
+            connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+
+    def acquire(self):
+        ''' returns a (connection, channel) pair ready to publish, reusing an
+        idle one if possible '''
+        while True:
+            try:
+                connection, channel = self.idle.get_nowait()
+            except Empty:
+                return self.connect()
+
+            if self.is_healthy(connection, channel):
+                return connection, channel
+
+            LOGGER.info('Discarding closed rabbitmq connection')
+            self.close(connection)
+
+    def release(self, connection, channel):
+        ''' gives back a pair obtained from ``acquire`` '''
+        if connection.is_closed or channel.is_closed:
+            return
+
+        try:
+            self.idle.put_nowait((connection, channel))
+        except Full:
+            self.close(connection)
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pool(config):
+    ''' returns the pool shared by this process '''
+    global _pool
+
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ChannelPool(config)
+
+    return _pool
+
+
+def get_channel():
+    ''' returns the channel borrowed by the current request '''
+    pair = getattr(g, '_rabbit', None)
+
+    if pair is None:
+        pair = g._rabbit = get_pool(current_app.config).acquire()
+
+    return pair[1]
+
+
+def release_channel(exception):
+    pair = g.pop('_rabbit', None)
+
+    if pair is not None:
+        get_pool(current_app.config).release(*pair)
+
 
-    return channel
+def init_app(app):
+    ''' gives back the borrowed channel when each request ends '''
+    app.teardown_appcontext(release_channel)
@@ -0,0 +1,61 @@
+''' Http sessions used by request nodes. Every thread keeps its own sessions
+(they are not thread safe) so connections to the same hosts are kept alive and
+reused between requests instead of opening a new one each time. '''
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import requests
+
+_local = threading.local()
+
+
+def make_session(config, retries):
+    ''' builds a session with a pool of ``REQUEST_POOL_SIZE`` connections per
+    host. Only failures to connect are retried, since the server might have
+    processed a request that failed while reading its response. Other
+    errors, like a failed ssl handshake, are raised at once '''
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=config['REQUEST_POOL_SIZE'],
+        pool_maxsize=config['REQUEST_POOL_SIZE'],
+        max_retries=Retry(
+            total=retries,
+            connect=retries,
+            read=False,
+            other=0,
+            status=0,
+            redirect=False,
+        ),
+    )
+
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def get_session(config, retries=None):
+    ''' returns this thread's session for the given number of retries,
+    defaults to ``REQUEST_RETRIES`` '''
+    if retries is None:
+        retries = config['REQUEST_RETRIES']
+
+    sessions = getattr(_local, 'sessions', None)
+
+    if sessions is None:
+        sessions = _local.sessions = dict()
+
+    if retries not in sessions:
+        sessions[retries] = make_session(config, retries)
+
+    return sessions[retries]
+
+
+def get_timeout(config, read_timeout=None):
+    ''' the (connect, read) timeout tuple used by requests '''
+    return (
+        config['REQUEST_CONNECT_TIMEOUT'],
+        read_timeout or config['REQUEST_READ_TIMEOUT'],
+    )
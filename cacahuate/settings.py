@@ -10,6 +10,20 @@ RABBIT_HEARTBEAT = 30  # Server default is 60 seconds
 RABBIT_QUEUE = 'cacahuate_process'
 RABBIT_NOTIFY_EXCHANGE = 'charpe_notify'
 RABBIT_CONSUMER_TAG = 'cacahuate_consumer_1'
+# Open channels kept by each api process for publishing
+RABBIT_POOL_SIZE = 10
+# Wait for rabbitmq to confirm every message published by the api
+RABBIT_PUBLISHER_CONFIRMS = False
+# Unacknowledged messages held by this process at a time, 0 means no limit
+RABBIT_PREFETCH_COUNT = 20
+
+# Threads processing messages in parallel, the messages of an execution are
+# always processed by the same thread, in order
+HANDLER_WORKERS = 1
+
+# Seconds between logs of the number of messages waiting to be processed, 0
+# disables them
+QUEUE_STATS_INTERVAL = 60
 
 # Default logging config
 LOGGING = {
@@ -49,9 +63,25 @@ LOGGING = {
     },
 }
 
+# Http requests made by request nodes. Timeouts are in seconds, the read
+# timeout and the retries can be overriden per node using the ``timeout`` and
+# ``retries`` attributes
+REQUEST_POOL_SIZE = 10
+REQUEST_CONNECT_TIMEOUT = 5
+REQUEST_READ_TIMEOUT = 60
+REQUEST_RETRIES = 0
+
+# Request nodes with async="true" run in this many background threads, with at
+# most ASYNC_REQUEST_HOST_LIMIT concurrent requests to the same host
+ASYNC_REQUEST_WORKERS = 10
+ASYNC_REQUEST_HOST_LIMIT = 4
+
 # Where to store xml files
 XML_PATH = os.path.join(base_dir, 'xml')
 
+# Parser used to read the xml files, either 'etree' or 'minidom'
+XML_PARSER = 'etree'
+
 # Custom path to templates
 TEMPLATE_PATH = None
 
@@ -64,6 +94,8 @@ EXECUTION_COLLECTION = 'execution'
 # Defaults for pagination
 PAGINATION_LIMIT = 20
 PAGINATION_OFFSET = 0
+# Documents fetched from mongo at a time while a listing is streamed
+PAGINATION_BATCH_SIZE = 100
 
 # Time stuff
 TIMEZONE = 'UTC'
@@ -84,6 +116,11 @@ ENABLED_LOGIN_PROVIDERS = [
     'ldap',
 ]
 
+# Seconds an api process trusts a successful authentication before checking
+# the token again, 0 disables it. At most AUTH_CACHE_SIZE logins are kept
+AUTH_CACHE_TTL = 10
+AUTH_CACHE_SIZE = 1024
+
 # Providers enabled for locating people in the system
 ENABLED_HIERARCHY_PROVIDERS = [
     'anyone',
@@ -110,6 +147,8 @@ IMPERSONATE_PASSWORD = 'set me to passlib.hash.pbkdf2_sha256.hash("something")'
 INVALID_FILTERS = (
     'limit',
     'offset',
+    'after',
+    'count',
 )
 
 PROCESS_ENV = {
@@ -1,10 +1,37 @@
-from jinja2 import Template, TemplateError
+from functools import lru_cache
+from jinja2 import Environment, TemplateError
+
+# how many distinct template sources are kept compiled
+TEMPLATE_CACHE_SIZE = 1024
+
+# the same defaults ``jinja2.Template`` would use
+ENVIRONMENT = Environment()
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_template(source):
+    ''' returns the compiled template for the given source '''
+    return ENVIRONMENT.from_string(source)
+
+
+def is_plain(template):
+    ''' tells if rendering the given template would be a no-op, which is the
+    case for most names and descriptions '''
+    return isinstance(template, str) and '{' not in template and \
+        '\r' not in template
 
 
 def render_or(template, default, context={}):
     ''' Renders the given template in case it is a valid jinja template or
     returns the default value '''
+    if is_plain(template):
+        # jinja removes a single trailing newline
+        if template.endswith('\n'):
+            return template[:-1]
+
+        return template
+
     try:
-        return Template(template).render(**context)
+        return get_template(template).render(**context)
     except TemplateError:
         return default
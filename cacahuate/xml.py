@@ -1,21 +1,23 @@
 from collections import deque
 from datetime import datetime, timezone
 from typing import TextIO, Callable
-from jsonpath_rw import parse as jsonpathparse
 from xml.dom import pulldom
 from xml.dom.minidom import Element
-import xml.dom.minidom as minidom
 from xml.sax._exceptions import SAXParseException
+import copy
 import json
 import os
 import pika
+import threading
 
 from cacahuate.errors import ProcessNotFound, ElementNotFound, MalformedProcess
+from cacahuate.jsonpath import parse_path
 from cacahuate.jsontypes import SortedMap
 from cacahuate.models import Execution, Pointer
 from cacahuate.forms import compact_values
 from cacahuate.templates import render_or
 from cacahuate.mongo import pointer_entry
+from cacahuate.xmlparser import parse_events, parse_document, ParseError
 
 
 XML_ATTRIBUTES = {
@@ -26,7 +28,7 @@ XML_ATTRIBUTES = {
     'description': lambda x: x,
 }
 
-NODES = (
+NODES = [
     'action',
     'validation',
     'exit',
@@ -35,7 +37,7 @@ NODES = (
     'else',
     'request',
     'call',
-)
+]
 
 
 class Xml:
@@ -52,6 +54,9 @@ class Xml:
         self.filename = filename
         self.config = config
 
+        # shared between the copies handed out by the registry
+        self._cache = {}
+
         try:
             info_node = self.get_info_node()
         except StopIteration:
@@ -74,7 +79,35 @@ class Xml:
         return os.path.join(self.config['XML_PATH'], self.filename)
 
     def get_dom(self):
-        return minidom.parse(self.get_file_path())
+        return parse_document(self.config['XML_PARSER'], self.get_file_path())
+
+    def get_source(self):
+        if 'source' not in self._cache:
+            with open(self.get_file_path()) as xmlfile:
+                self._cache['source'] = xmlfile.read()
+
+        return self._cache['source']
+
+    def get_form_array(self):
+        ''' returns the description of the forms of the first node, used to
+        start the process '''
+        if 'form_array' not in self._cache:
+            xmliter = iter(self)
+            first_node = next(xmliter)
+            xmliter.parser.expandNode(first_node)
+
+            self._cache['form_array'] = [
+                form_to_dict(form)
+                for form in first_node.getElementsByTagName('form')
+            ]
+
+        return self._cache['form_array']
+
+    def get_graph(self):
+        ''' returns the compiled, cached graph of this process '''
+        from cacahuate.graph import get_graph  # noqa
+
+        return get_graph(self)
 
     # Interpolate name
     def get_name(self, context={}):
@@ -109,9 +142,11 @@ class Xml:
         common_name is the prefix of the file to find. If multiple files with
         the same prefix are found the last in lexicographical order is
         returned.'''
+        registry = get_registry(config)
+
         if direct:
             # skip looking for the most recent version
-            return Xml(config, common_name)
+            return registry.get(config, common_name)
 
         pieces = common_name.split('.')
 
@@ -121,27 +156,7 @@ class Xml:
         except IndexError:
             name, version = common_name, None
 
-        files = reversed(sorted(os.listdir(config['XML_PATH'])))
-
-        for filename in files:
-            fpieces = filename.split('.')
-
-            try:
-                fname = fpieces[0]
-                fversion = fpieces[1]
-            except IndexError:
-                # Process with malformed name, sorry
-                continue
-
-            if fname == name:
-                if version:
-                    if fversion == version:
-                        return Xml(config, filename)
-                else:
-                    return Xml(config, filename)
-
-        else:
-            raise ProcessNotFound(common_name)
+        return registry.find(config, name, version, common_name)
 
     def start(self, node, input, mongo, channel, user_identifier):
         # the first set of values
@@ -196,6 +211,7 @@ class Xml:
                 }],
             },
             'actors': {},
+            'actor_identifiers': [],
             'actor_list': [],
         })
 
@@ -220,7 +236,10 @@ class Xml:
         class Iter():
 
             def __init__(self, file_path):
-                self.parser = pulldom.parse(open(file_path))
+                self.parser = parse_events(
+                    xmlself.config['XML_PARSER'],
+                    file_path,
+                )
                 self.block_stack = deque()
 
             def find(self, testfunc: Callable[[Element], bool]) -> Element:
@@ -278,7 +297,7 @@ class Xml:
                                 self.block_stack.append(1)
                             elif node.tagName in iterables:
                                 return node
-                except SAXParseException:
+                except (SAXParseException, ParseError):
                     raise MalformedProcess
 
                 raise StopIteration
@@ -302,22 +321,19 @@ class Xml:
         return self.make_iterator(NODES)
 
     def get_state(self):
-        from cacahuate.node import make_node  # noqa
-
-        xmliter = iter(self)
-        items = []
-
-        for node in xmliter:
-            built_node = make_node(node, xmliter)
+        ''' the state of a new execution, with every node unfilled. It is
+        built once per process version, callers get their own copy '''
+        if 'state' not in self._cache:
+            self._cache['state'] = SortedMap([
+                node.get_state() for node in self.get_graph()
+            ], key='id').to_json()
 
-            items.append(built_node.get_state())
-
-        return SortedMap(items, key='id').to_json()
+        return copy.deepcopy(self._cache['state'])
 
     @classmethod
     def list(cls, config):
         # Get all processes
-        files = reversed(sorted(os.listdir(config['XML_PATH'])))
+        files = get_registry(config).listdir()
 
         # Load only the oldest processes
         processes = []
@@ -357,6 +373,106 @@ class Xml:
         }
 
 
+class ProcessRegistry:
+    ''' An in-memory index of the process definitions found in a directory.
+    The listing is read again only when the directory's mtime changes and each
+    file is parsed again only when its own mtime does, so loading or listing
+    processes doesn't touch the disk besides a couple of ``stat`` calls. '''
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.filenames = []
+        self.names = {}
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        mtime = os.stat(self.path).st_mtime
+
+        if mtime == self.mtime:
+            return
+
+        with self.lock:
+            filenames = list(reversed(sorted(os.listdir(self.path))))
+            names = {}
+
+            for filename in filenames:
+                fpieces = filename.split('.')
+
+                if len(fpieces) < 2:
+                    # Process with malformed name, sorry
+                    continue
+
+                names.setdefault(fpieces[0], []).append(filename)
+
+            for filename in set(self.entries) - set(filenames):
+                self.entries.pop(filename, None)
+
+            self.filenames = filenames
+            self.names = names
+            self.mtime = mtime
+
+    def listdir(self):
+        ''' filenames in the directory, most recent versions first '''
+        self.refresh()
+
+        return self.filenames
+
+    def get(self, config, filename):
+        ''' returns a copy of the process defined in ``filename`` bound to the
+        given config '''
+        try:
+            mtime = os.stat(os.path.join(self.path, filename)).st_mtime
+        except FileNotFoundError:
+            # let the constructor report the problem as it always has
+            return Xml(config, filename)
+
+        entry = self.entries.get(filename)
+
+        if entry is None or entry[0] != mtime:
+            try:
+                entry = (mtime, Xml(config, filename), None)
+            except MalformedProcess as e:
+                entry = (mtime, None, e.args)
+
+            self.entries[filename] = entry
+
+        _, xml, error = entry
+
+        if error is not None:
+            raise MalformedProcess(*error)
+
+        xml = copy.copy(xml)
+        xml.config = config
+        xml.versions = [xml.version]
+
+        return xml
+
+    def find(self, config, name, version=None, common_name=None):
+        ''' returns the latest version of the process called ``name`` or the
+        requested ``version`` of it '''
+        self.refresh()
+
+        for filename in self.names.get(name, []):
+            if not version or filename.split('.')[1] == version:
+                return self.get(config, filename)
+
+        raise ProcessNotFound(common_name or name)
+
+
+_REGISTRIES = dict()
+
+
+def get_registry(config):
+    path = config['XML_PATH']
+
+    if path not in _REGISTRIES:
+        _REGISTRIES[path] = ProcessRegistry(path)
+
+    return _REGISTRIES[path]
+
+
 def get_node_info(node):
     # Get node-info
     node_info = node.getElementsByTagName('node-info')
@@ -466,17 +582,19 @@ def input_to_dict(input, context=None):
         if ref_attr:
             ref_type, ref_path = ref_attr.split('#')
             if ref_type == 'form':
-                if not len(jsonpathparse(ref_path).find(context)):
+                found = parse_path(ref_path).find(context)
+
+                if not len(found):
                     continue
 
-                label_path = opt.getAttribute('label')
-                value_path = opt.getAttribute('value')
+                label_path = parse_path(opt.getAttribute('label'))
+                value_path = parse_path(opt.getAttribute('value'))
 
-                match = jsonpathparse(ref_path).find(context)[0].value.all()
+                match = found[0].value.all()
                 for localdata in match:
                     options.append({
-                        'value': jsonpathparse(value_path).find(localdata)[0].value,
-                        'label': jsonpathparse(label_path).find(localdata)[0].value,
+                        'value': value_path.find(localdata)[0].value,
+                        'label': label_path.find(localdata)[0].value,
                     })
 
         else:
@@ -0,0 +1,141 @@
+''' Parser backends for process definitions. Processes are read as a stream
+of events with the interface of ``xml.dom.pulldom`` and nodes read their
+elements with the interface of ``xml.dom.minidom``. The ``etree`` backend
+implements the part of both interfaces used by cacahuate on top of
+``xml.etree.ElementTree``, whose parser is written in C and doesn't build a
+DOM for every expanded element. The backend is chosen with the
+``XML_PARSER`` setting. '''
+from xml.dom import pulldom
+from xml.etree import ElementTree
+import xml.dom.minidom as minidom
+
+# Errors raised by the backends on malformed files
+ParseError = ElementTree.ParseError
+
+
+class EtreeText:
+    ''' the text of an element, as minidom's text nodes '''
+
+    def __init__(self, data):
+        self.nodeValue = data
+
+
+class EtreeElement:
+    ''' minidom-like view of an ElementTree element '''
+
+    __slots__ = ('element',)
+
+    # minidom elements have no value, only their text children do
+    nodeValue = None
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tagName(self):
+        return self.element.tag
+
+    @property
+    def attributes(self):
+        return self.element.attrib
+
+    @property
+    def firstChild(self):
+        if self.element.text:
+            return EtreeText(self.element.text)
+
+        if len(self.element):
+            return EtreeElement(self.element[0])
+
+        return None
+
+    def getAttribute(self, name):
+        return self.element.get(name, '')
+
+    def setAttribute(self, name, value):
+        self.element.set(name, value)
+
+    def getElementsByTagName(self, name):
+        ''' descendants with the given tag, in document order '''
+        return [
+            EtreeElement(element)
+            for element in self.element.iter(name)
+            if element is not self.element
+        ]
+
+    def normalize(self):
+        # adjacent text is always merged by ElementTree
+        pass
+
+
+class EtreeDocument(EtreeElement):
+    ''' minidom-like view of a parsed file, unlike elements a document's
+    search includes its root '''
+
+    __slots__ = ()
+
+    def getElementsByTagName(self, name):
+        return [
+            EtreeElement(element)
+            for element in self.element.iter(name)
+        ]
+
+
+class EtreeEventStream:
+    ''' pulldom-like stream of the start and end events of a file '''
+
+    def __init__(self, file_path):
+        self.events = ElementTree.iterparse(
+            file_path,
+            events=('start', 'end'),
+        )
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event, element = next(self.events)
+
+        if event == 'start':
+            return pulldom.START_ELEMENT, EtreeElement(element)
+
+        return pulldom.END_ELEMENT, EtreeElement(element)
+
+    def expandNode(self, node):
+        ''' reads the stream up to the end of ``node`` so all of its
+        descendants are available '''
+        for event, element in self.events:
+            if event == 'end' and element is node.element:
+                return
+
+
+def minidom_events(file_path):
+    return pulldom.parse(open(file_path))
+
+
+def etree_document(file_path):
+    return EtreeDocument(ElementTree.parse(file_path).getroot())
+
+
+# (event stream, document) constructors of each backend
+BACKENDS = {
+    'minidom': (minidom_events, minidom.parse),
+    'etree': (EtreeEventStream, etree_document),
+}
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError('Unknown xml parser backend: {}'.format(name))
+
+
+def parse_events(name, file_path):
+    ''' returns a pulldom-like event stream of the given file '''
+    return get_backend(name)[0](file_path)
+
+
+def parse_document(name, file_path):
+    ''' returns the whole file as a minidom-like document '''
+    return get_backend(name)[1](file_path)
@@ -55,6 +55,7 @@ setup(
             'cacahuated = cacahuate.main:main',
             'xml_validate = cacahuate.main:xml_validate',
             'rng_path = cacahuate.main:rng_path',
+            'cacahuate_migrate = cacahuate.main:migrate',
         ],
     },
 
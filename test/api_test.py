@@ -471,6 +471,7 @@ def test_start_process(client, mocker, config, mongo):
             }],
         },
         'actors': {},
+        'actor_identifiers': [],
         'actor_list': [],
     }
 
@@ -1824,9 +1825,6 @@ def test_data_mix_filter_user_identifier(mongo, client, config):
     ptr_03 = make_pointer('exit_request.2018-03-20.xml', 'requester')
     ptr_04 = make_pointer('validation.2018-05-09.xml', 'approval_node')
 
-    # set some tasks to user
-    juan.proxy.tasks.set([ptr_02])
-
     ptr_01_json = ptr_01.to_json(include=['*', 'execution'])
     ptr_02_json = ptr_02.to_json(include=['*', 'execution'])
     ptr_03_json = ptr_03.to_json(include=['*', 'execution'])
@@ -1838,6 +1836,10 @@ def test_data_mix_filter_user_identifier(mongo, client, config):
     ptr_03_json['started_at'] = '2018-04-01T21:47:00+00:00'
     ptr_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some tasks to user
+    ptr_02_json['state'] = 'ongoing'
+    ptr_02_json['notified_users'] = [{'identifier': juan.identifier}]
+
     # Pointer collection
     mongo[config["POINTER_COLLECTION"]].insert_many([
         ptr_01_json.copy(),
@@ -1853,9 +1855,6 @@ def test_data_mix_filter_user_identifier(mongo, client, config):
     exec_03 = ptr_03.proxy.execution.get()
     exec_04 = ptr_04.proxy.execution.get()
 
-    # set some activities to user
-    juan.proxy.activities.set([exec_03])
-
     exec_01_json = exec_01.to_json()
     exec_02_json = exec_02.to_json()
     exec_03_json = exec_03.to_json()
@@ -1867,6 +1866,13 @@ def test_data_mix_filter_user_identifier(mongo, client, config):
     exec_03_json['started_at'] = '2018-04-01T21:47:00+00:00'
     exec_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some activities to user
+    exec_03_json['status'] = 'ongoing'
+    exec_03_json['actor_list'] = [{
+        'node': 'requester',
+        'actor': {'identifier': juan.identifier},
+    }]
+
     # Execution collection
     mongo[config["EXECUTION_COLLECTION"]].insert_many([
         exec_01_json.copy(),
@@ -1949,9 +1955,6 @@ def test_data_mix_filter_user_identifier_executionless(mongo, client, config):
     ptr_03 = make_pointer('exit_request.2018-03-20.xml', 'requester')
     ptr_04 = make_pointer('validation.2018-05-09.xml', 'approval_node')
 
-    # set some tasks to user
-    juan.proxy.tasks.set([ptr_02])
-
     ptr_01_json = ptr_01.to_json(include=['*', 'execution'])
     ptr_02_json = ptr_02.to_json(include=['*', 'execution'])
     ptr_03_json = ptr_03.to_json(include=['*', 'execution'])
@@ -1963,6 +1966,10 @@ def test_data_mix_filter_user_identifier_executionless(mongo, client, config):
     ptr_03_json['started_at'] = '2018-04-01T21:47:00+00:00'
     ptr_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some tasks to user
+    ptr_02_json['state'] = 'ongoing'
+    ptr_02_json['notified_users'] = [{'identifier': juan.identifier}]
+
     # Pointer collection
     mongo[config["POINTER_COLLECTION"]].insert_many([
         ptr_01_json.copy(),
@@ -1978,9 +1985,6 @@ def test_data_mix_filter_user_identifier_executionless(mongo, client, config):
     exec_03 = ptr_03.proxy.execution.get()
     exec_04 = ptr_04.proxy.execution.get()
 
-    # set some activities to user
-    juan.proxy.activities.set([exec_03])
-
     exec_01_json = exec_01.to_json()
     exec_02_json = exec_02.to_json()
     exec_03_json = exec_03.to_json()
@@ -1992,6 +1996,13 @@ def test_data_mix_filter_user_identifier_executionless(mongo, client, config):
     exec_03_json['started_at'] = '2018-04-01T21:47:00+00:00'
     exec_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some activities to user
+    exec_03_json['status'] = 'ongoing'
+    exec_03_json['actor_list'] = [{
+        'node': 'requester',
+        'actor': {'identifier': juan.identifier},
+    }]
+
     # Execution collection
     mongo[config["EXECUTION_COLLECTION"]].insert_many([
         exec_01_json.copy(),
@@ -2074,6 +2085,7 @@ def test_data_mix_filter_actor_identifier(mongo, client, config):
         'mid_node': 'bar',
         'first_node': 'zas',
     }
+    exec_01_json['actor_identifiers'] = ['bar', 'foo', 'zas']
     exec_01_json['state'] = {'item_order': [
         'first_node',
         'mid_node',
@@ -2083,6 +2095,7 @@ def test_data_mix_filter_actor_identifier(mongo, client, config):
     exec_02_json['actors'] = {
         'first_node': 'mine',
     }
+    exec_02_json['actor_identifiers'] = ['mine']
     exec_02_json['state'] = {'item_order': [
         'first_node',
         'mid_node',
@@ -2092,6 +2105,7 @@ def test_data_mix_filter_actor_identifier(mongo, client, config):
     exec_03_json['actors'] = {
         'mid_node': 'foo',
     }
+    exec_03_json['actor_identifiers'] = ['foo']
     exec_03_json['state'] = {'item_order': [
         'first_node',
         'mid_node',
@@ -2510,8 +2524,6 @@ def test_logs_filter_user(mongo, client, config):
     ptr_03 = make_pointer('exit_request.2018-03-20.xml', 'requester')
     ptr_04 = make_pointer('validation.2018-05-09.xml', 'approval_node')
 
-    juan.proxy.tasks.set([ptr_01, ptr_02, ptr_04])
-
     ptr_01_json = ptr_01.to_json(include=['*', 'execution'])
     ptr_02_json = ptr_02.to_json(include=['*', 'execution'])
     ptr_03_json = ptr_03.to_json(include=['*', 'execution'])
@@ -2522,6 +2534,11 @@ def test_logs_filter_user(mongo, client, config):
     ptr_02_json['started_at'] = '2018-04-01T21:46:00+00:00'
     ptr_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some tasks to user
+    for ptr_json in (ptr_01_json, ptr_02_json, ptr_04_json):
+        ptr_json['state'] = 'ongoing'
+        ptr_json['notified_users'] = [{'identifier': juan.identifier}]
+
     mongo[config["POINTER_COLLECTION"]].insert_many([
         ptr_01_json.copy(),
         ptr_02_json.copy(),
@@ -3178,8 +3195,6 @@ def test_execution_filter_user(mongo, client, config):
     exec_03 = ptr_03.proxy.execution.get()
     exec_04 = ptr_04.proxy.execution.get()
 
-    juan.proxy.activities.set([exec_01, exec_02, exec_04])
-
     exec_01_json = exec_01.to_json()
     exec_02_json = exec_02.to_json()
     exec_03_json = exec_03.to_json()
@@ -3190,6 +3205,14 @@ def test_execution_filter_user(mongo, client, config):
     exec_02_json['started_at'] = '2018-04-01T21:46:00+00:00'
     exec_04_json['started_at'] = '2018-04-01T21:48:00+00:00'
 
+    # set some activities to user
+    for exec_json in (exec_01_json, exec_02_json, exec_04_json):
+        exec_json['status'] = 'ongoing'
+        exec_json['actor_list'] = [{
+            'node': 'mid_node',
+            'actor': {'identifier': juan.identifier},
+        }]
+
     mongo[config["EXECUTION_COLLECTION"]].insert_many([
         exec_01_json.copy(),
         exec_02_json.copy(),
@@ -3762,6 +3785,125 @@ def test_pagination_v1_log_all(client, mongo, config):
     assert len(json.loads(res.data)['data']) == 2
 
 
+def test_keyset_pagination(client, mongo, config):
+    mongo[config["EXECUTION_COLLECTION"]].insert_many([
+        {'id': 'a', 'started_at': make_date(2018, 5, 1)},
+        {'id': 'b', 'started_at': make_date(2018, 5, 2)},
+        {'id': 'c', 'started_at': make_date(2018, 5, 2)},
+        {'id': 'd', 'started_at': make_date(2018, 5, 3)},
+        {'id': 'e', 'started_at': make_date(2018, 5, 4)},
+    ])
+
+    res = client.get('/v1/execution?limit=2&after=&count=none')
+    data = json.loads(res.data)
+
+    assert res.status_code == 200
+    assert 'total_count' not in data
+    assert [e['id'] for e in data['data']] == ['e', 'd']
+
+    ids = []
+
+    while data['next_cursor']:
+        res = client.get('/v1/execution?limit=2&offset=1&after={}'.format(
+            data['next_cursor'],
+        ))
+        data = json.loads(res.data)
+
+        assert res.status_code == 200
+        assert data['total_count'] == 5
+
+        ids += [e['id'] for e in data['data']]
+
+    # the offset is ignored and executions started at the same time are
+    # ordered by id
+    assert ids == ['b', 'c', 'a']
+
+
+def test_keyset_pagination_projection(client, mongo, config):
+    mongo[config["EXECUTION_COLLECTION"]].insert_many([
+        {'id': 'a', 'name': 'A', 'started_at': make_date(2018, 5, 1)},
+        {'id': 'b', 'name': 'B', 'started_at': make_date(2018, 5, 2)},
+        {'id': 'c', 'name': 'C', 'started_at': make_date(2018, 5, 3)},
+    ])
+
+    for projection in ('include=name', 'exclude=started_at,id'):
+        url = '/v1/execution?limit=2&count=none&{}&after={}'
+        cursor = ''
+        names = []
+
+        while cursor is not None:
+            data = json.loads(client.get(url.format(projection, cursor)).data)
+
+            # the fields of the cursor are not shown if not requested
+            assert all(set(e) == {'name'} for e in data['data'])
+
+            names += [e['name'] for e in data['data']]
+            cursor = data['next_cursor']
+
+        assert names == ['C', 'B', 'A']
+
+
+def test_ndjson_listing(client, mongo, config):
+    mongo[config["EXECUTION_COLLECTION"]].insert_many([
+        {'id': 'a', 'started_at': make_date(2018, 5, 1)},
+        {'id': 'b', 'started_at': make_date(2018, 5, 2)},
+        {'id': 'c', 'started_at': make_date(2018, 5, 3)},
+    ])
+
+    res = client.get('/v1/execution?limit=2', headers={
+        'Accept': 'application/x-ndjson',
+    })
+
+    assert res.status_code == 200
+    assert res.mimetype == 'application/x-ndjson'
+    assert res.headers['X-Total-Count'] == '3'
+    assert [
+        json.loads(line)['id'] for line in res.data.decode().splitlines()
+    ] == ['c', 'b']
+
+    # with keyset pagination the cursor is in the last line
+    lines = []
+    cursor = ''
+
+    while cursor is not None:
+        res = client.get('/v1/execution?limit=2&after=' + cursor, headers={
+            'Accept': 'application/x-ndjson',
+        })
+        *page, last = map(json.loads, res.data.decode().splitlines())
+
+        assert last['_type'] == 'cursor'
+
+        lines += page
+        cursor = last['next_cursor']
+
+    assert [line['id'] for line in lines] == ['c', 'b', 'a']
+
+    # the default is still a json object
+    res = client.get('/v1/execution?limit=2&count=none')
+
+    assert res.status_code == 200
+    assert res.mimetype == 'application/json'
+    assert 'X-Total-Count' not in res.headers
+    assert [e['id'] for e in json.loads(res.data)['data']] == ['c', 'b']
+
+
+def test_keyset_pagination_errors(client, mongo, config):
+    res = client.get('/v1/execution?after=notacursor')
+
+    assert res.status_code == 400
+    assert json.loads(res.data)['errors'][0]['where'] == 'request.args.after'
+
+    res = client.get('/v1/execution?after=&sort=status')
+
+    assert res.status_code == 400
+    assert json.loads(res.data)['errors'][0]['where'] == 'request.args.after'
+
+    res = client.get('/v1/execution?count=some')
+
+    assert res.status_code == 400
+    assert json.loads(res.data)['errors'][0]['where'] == 'request.args.count'
+
+
 def test_name_with_if(client, mongo, config):
     xml = Xml.load(config, 'pollo')
     assert xml.name == 'pollo.2018-05-20.xml'
@@ -2,6 +2,11 @@ from base64 import b64encode
 from flask import json
 from random import choice
 from string import ascii_letters
+from unittest.mock import patch
+
+from cacahuate.models import User
+
+from .utils import make_auth, make_user
 
 
 def test_unexistent_backend(client):
@@ -71,6 +76,74 @@ def test_login_token(client):
     assert data['data']['identifier'] == user
 
 
+def test_auth_cache(client):
+    from cacahuate.http import middleware
+
+    juan = make_user('juan', 'Juan')
+    token = juan.proxy.tokens.get()[0]
+
+    with patch.object(
+        middleware, 'fetch_user', wraps=middleware.fetch_user,
+    ) as fetch_user:
+        for _ in range(3):
+            res = client.get('/v1/auth/whoami', headers=make_auth(juan))
+
+            assert res.status_code == 200
+            assert json.loads(res.data)['data']['identifier'] == 'juan'
+
+        assert fetch_user.call_count == 1
+
+        # a wrong token is never served from the cache
+        res = client.get('/v1/auth/whoami', headers={
+            'Authorization': 'Basic {}'.format(
+                b64encode(b'juan:wrong').decode()
+            ),
+        })
+
+        assert res.status_code == 401
+
+        # the token now belongs to someone else
+        pepe = make_user('pepe', 'Pepe')
+        token.proxy.user.set(pepe)
+
+        res = client.get('/v1/auth/whoami', headers=make_auth(pepe))
+
+        assert res.status_code == 200
+
+        middleware.forget_user('juan')
+
+        res = client.get('/v1/auth/whoami', headers={
+            'Authorization': 'Basic {}'.format(b64encode(
+                'juan:{}'.format(token.token).encode()
+            ).decode()),
+        })
+
+        assert res.status_code == 401
+
+
+def test_fetch_user_single_call(client):
+    from cacahuate.http import middleware
+
+    juan = make_user('juan', 'Juan')
+    token = juan.proxy.tokens.get()[0].token
+    redis = User.get_redis()
+
+    # the first call might need to load the script
+    middleware.fetch_user('juan', token)
+
+    with patch.object(
+        redis, 'execute_command', wraps=redis.execute_command,
+    ) as execute_command:
+        user_id, data = middleware.fetch_user('juan', token)
+
+        assert execute_command.call_count == 1
+
+    assert user_id == juan.id
+    assert data['identifier'] == 'juan'
+    assert middleware.fetch_user('juan', 'wrong') is None
+    assert middleware.fetch_user('pepe', token) is None
+
+
 def test_ldap_backend():
     from cacahuate.auth.backends.ldap import LdapAuthProvider  # noqa
 
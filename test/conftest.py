@@ -75,9 +75,13 @@ def bind_models(config):
 def client():
     ''' makes and returns a testclient for the flask application '''
     from cacahuate.http.wsgi import app
+    from cacahuate.http.middleware import AUTH_CACHE
 
     app.config.from_mapping(TESTING_SETTINGS)
 
+    # users from previous tests are gone from redis
+    AUTH_CACHE.clear()
+
     return app.test_client()
 
 
@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+from threading import Event, Lock
+import time
+
+import pika
+
+from cacahuate.dispatch import Dispatcher
+
+
+def test_host_limit(config):
+    config = dict(config, ASYNC_REQUEST_WORKERS=4, ASYNC_REQUEST_HOST_LIMIT=2)
+    dispatcher = Dispatcher(config)
+    lock = Lock()
+    running = {'a': 0, 'b': 0}
+    peaks = {'a': 0, 'b': 0}
+    done = []
+    finished = Event()
+
+    def make_job(host):
+        def job():
+            with lock:
+                running[host] += 1
+                peaks[host] = max(peaks[host], running[host])
+
+            time.sleep(0.01)
+
+            with lock:
+                running[host] -= 1
+                done.append(host)
+
+                if len(done) == 12:
+                    finished.set()
+
+        return job
+
+    for i in range(6):
+        dispatcher.submit('a', make_job('a'))
+        dispatcher.submit('b', make_job('b'))
+
+    assert finished.wait(5)
+    dispatcher.executor.shutdown(wait=True)
+
+    assert peaks == {'a': 2, 'b': 2}
+    assert dispatcher.running == {}
+    assert dispatcher.pending == {}
+
+
+def test_failing_job_frees_its_slot(config):
+    config = dict(config, ASYNC_REQUEST_WORKERS=1, ASYNC_REQUEST_HOST_LIMIT=1)
+    dispatcher = Dispatcher(config)
+    finished = Event()
+
+    def fail():
+        raise Exception('boom')
+
+    dispatcher.submit('a', fail)
+    dispatcher.submit('a', finished.set)
+
+    assert finished.wait(5)
+
+
+def test_publish_replaces_dropped_connection(config):
+    dispatcher = Dispatcher(config)
+
+    with patch('pika.BlockingConnection') as bc:
+        first = MagicMock()
+        first.channel.return_value.is_closed = False
+        # the broker dropped the connection while it was idle
+        first.channel.return_value.basic_publish.side_effect = \
+            pika.exceptions.StreamLostError()
+        first.close.side_effect = pika.exceptions.ConnectionWrongStateError()
+
+        second = MagicMock()
+        second.channel.return_value.is_closed = False
+        bc.side_effect = [first, second]
+
+        dispatcher.publish({'command': 'step'})
+
+        assert bc.call_count == 2
+
+    for call in bc.call_args_list:
+        assert call[0][0].heartbeat == config['RABBIT_HEARTBEAT']
+
+    first.close.assert_called_once_with()
+    second.channel.return_value.basic_publish.assert_called_once()
+    assert dispatcher.get_channel() is second.channel.return_value
@@ -1,4 +1,4 @@
-from cacahuate.grammar import Condition, ConditionTransformer
+from cacahuate.grammar import Condition, ConditionTransformer, parse_condition
 
 
 def test_condition():
@@ -171,3 +171,66 @@ def test_everything():
         'form.input IN ["no"] OR 1 == 2'
     )
     assert ConditionTransformer(values).transform(tree) is True
+
+
+def test_parser_is_shared():
+    assert Condition().parser is Condition().parser
+
+
+def test_parse_is_memoized():
+    values = {
+        'set': {
+            'A': 1,
+        },
+    }
+
+    tree = Condition().parse('set.A == 1 && set.A != 2')
+    hits = parse_condition.cache_info().hits
+
+    assert Condition().parse('set.A == 1 && set.A != 2') is tree
+    assert parse_condition.cache_info().hits == hits + 1
+
+    # the cached tree can be transformed many times
+    assert ConditionTransformer(values).transform(tree) is True
+    assert ConditionTransformer(values).transform(tree) is True
+
+
+def test_compiled_condition():
+    values = {
+        'form': {
+            'input': 'no',
+            'number': 3,
+            'flag': True,
+        },
+    }
+
+    conditions = [
+        'form.input == "no"',
+        'form.input != "no"',
+        'form.number > 2 && form.number <= 3',
+        'form.number < 2 OR form.flag',
+        '!form.flag',
+        '!!3<0 || !(form.input == "0" && ("da" != "de"))',
+        'FALSE OR !(form.input == "0" AND TRUE)',
+        'form.input IN ["no", "yes"]',
+        'form.input NOT IN ["no", "yes"]',
+        'form.number IN [1, 2, 3]',
+        '[1, 2, 3] == [1, 2, 3,]',
+        '[] == []',
+        # chained comparisons are evaluated left to right
+        '3 > 2 > 1',
+        '1 < 2 == TRUE',
+        'TRUE || FALSE && FALSE',
+    ]
+
+    for condition in conditions:
+        tree = Condition().parse(condition)
+
+        assert Condition().compile(condition)(values) == \
+            ConditionTransformer(values).transform(tree), condition
+
+
+def test_compiled_list():
+    assert Condition().compile('[]')({}) == []
+    assert Condition().compile('["hello",]')({}) == ['hello']
+    assert Condition().compile('[1, 2, 3]')({}) == [1, 2, 3]
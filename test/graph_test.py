@@ -0,0 +1,75 @@
+import os
+import pytest
+
+from cacahuate.errors import ElementNotFound
+from cacahuate.graph import get_graph
+from cacahuate.node import Action, If
+from cacahuate.xml import Xml
+
+
+def test_graph_nodes(config):
+    graph = Xml.load(config, 'simple').get_graph()
+
+    assert [node.id for node in graph] == [
+        'start_node',
+        'mid_node',
+        'final_node',
+    ]
+    assert isinstance(graph.first(), Action)
+    assert graph.get_node('mid_node').id == 'mid_node'
+
+    with pytest.raises(ElementNotFound):
+        graph.get_node('nonexistent')
+
+
+def test_graph_next_of(config):
+    graph = Xml.load(config, 'simple').get_graph()
+
+    assert graph.next_of('start_node').id == 'mid_node'
+    assert graph.next_of('mid_node').id == 'final_node'
+
+    with pytest.raises(StopIteration):
+        graph.next_of('final_node')
+
+
+def test_graph_next_of_conditional(config):
+    graph = Xml.load(config, 'else').get_graph()
+
+    assert isinstance(graph.get_node('condition01'), If)
+
+    # condition met
+    assert graph.next_of('condition01').id == 'action01'
+    # condition not met
+    assert graph.next_of('condition01', skip_block=True).id == 'elif01'
+
+    # leaving a block skips the remaining elif/else siblings
+    with pytest.raises(StopIteration):
+        graph.next_of('action01')
+
+
+def test_graph_is_cached(config):
+    xml = Xml.load(config, 'simple')
+
+    graph = get_graph(xml)
+
+    assert get_graph(xml) is graph
+
+    # touching the file invalidates the cache
+    path = xml.get_file_path()
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+    try:
+        assert get_graph(xml) is not graph
+    finally:
+        os.utime(path, (stat.st_atime, stat.st_mtime))
+
+
+def test_graph_dependents(config):
+    graph = Xml.load(config, 'all-nodes-invalidated').get_graph()
+
+    def ids(positions):
+        return [graph.nodes[i].id for i in positions]
+
+    assert ids(graph.dependents['work.task']) == ['validation_node']
+    assert ids(graph.unconditional) == ['if_node']
@@ -151,6 +151,95 @@ def test_wakeup(config, mongo):
     assert task.proxy.execution.get().id == execution.id
 
 
+def test_step_round_trips(config, mongo):
+    handler = Handler(config)
+
+    pointer = make_pointer('simple.2018-02-19.xml', 'start_node')
+    execution = pointer.proxy.execution.get()
+    juan = User(identifier='juan').save()
+    User(identifier='juan_manager').save()
+
+    mongo[config["EXECUTION_COLLECTION"]].insert_one({
+        '_type': 'execution',
+        'id': execution.id,
+        'state': Xml.load(config, execution.process_name).get_state(),
+        'values': {
+            '_execution': [{
+                'name': '',
+                'description': '',
+            }],
+        },
+        'actors': {'start_node': 'juan'},
+    })
+
+    handler(MagicMock(), json.dumps({
+        'command': 'step',
+        'pointer_id': pointer.id,
+        'user_identifier': juan.identifier,
+        'input': [],
+    }))
+
+    # the execution is only read by the update that tears down the node, the
+    # rest of the writes are sent in one batch per collection
+    assert handler.get_mongo().counts == {
+        'reads': 0,
+        'writes': 3,
+    }
+    assert handler.get_mongo().pending == {}
+
+    ptr = execution.proxy.pointers.get()[0]
+    assert ptr.node_id == 'mid_node'
+
+
+def test_teardown_leaves_finished_pointers(config, mongo):
+    handler = Handler(config)
+
+    pointer = make_pointer('simple.2018-02-19.xml', 'mid_node')
+    execution = pointer.proxy.execution.get()
+    juan = User(identifier='juan').save()
+
+    mongo[config["EXECUTION_COLLECTION"]].insert_one({
+        '_type': 'execution',
+        'id': execution.id,
+        'state': Xml.load(config, execution.process_name).get_state(),
+    })
+    mongo[config["POINTER_COLLECTION"]].insert_many([{
+        'id': 'finished_pointer',
+        'state': 'finished',
+        'execution': {'id': execution.id, 'name': 'old'},
+    }, {
+        'id': pointer.id,
+        'state': 'ongoing',
+        'execution': {'id': execution.id, 'name': 'old'},
+    }, {
+        'id': 'parallel_pointer',
+        'state': 'ongoing',
+        'execution': {'id': execution.id, 'name': 'old'},
+    }])
+
+    handler.teardown(
+        Xml.load(config, 'simple').get_graph().get_node('mid_node'),
+        pointer,
+        juan,
+        [],
+    )
+    handler.get_mongo().flush()
+
+    def get_execution(id):
+        return mongo[config["POINTER_COLLECTION"]].find_one({
+            'id': id,
+        })['execution']
+
+    assert get_execution('finished_pointer') == {
+        'id': execution.id,
+        'name': 'old',
+    }
+    execution.reload()
+
+    assert get_execution(pointer.id) == execution.to_json()
+    assert get_execution('parallel_pointer') == execution.to_json()
+
+
 def test_teardown(config, mongo):
     ''' second and last stage of a node's lifecycle '''
     # test setup
@@ -0,0 +1,143 @@
+from datetime import datetime
+from pymongo import MongoClient
+
+from cacahuate.indexes import create_indexes, migrate
+
+
+def stages(plan):
+    yield plan['stage']
+
+    for key in ('inputStage', 'inputStages'):
+        children = plan.get(key, [])
+
+        if isinstance(children, dict):
+            children = [children]
+
+        for child in children:
+            yield from stages(child)
+
+
+def assert_uses_index(cursor):
+    plan = cursor.explain()['queryPlanner']['winningPlan']
+
+    assert 'COLLSCAN' not in stages(plan)
+
+
+def test_main_queries_use_indexes(config):
+    create_indexes(config)
+    # the second call must not fail
+    create_indexes(config)
+
+    db = MongoClient()[config['MONGO_DBNAME']]
+    execution = db[config['EXECUTION_COLLECTION']]
+    pointer = db[config['POINTER_COLLECTION']]
+
+    execution.insert_one({
+        'id': 'exe',
+        'status': 'ongoing',
+        'actor_list': [{'actor': {'identifier': 'juan'}}],
+        'process_name': 'simple.2018-02-19.xml',
+        'started_at': datetime.now(),
+    })
+    pointer.insert_one({
+        'id': 'ptr',
+        'state': 'ongoing',
+        'process_id': 'simple.2018-02-19.xml',
+        'node': {'id': 'start_node'},
+        'execution': {'id': 'exe'},
+        'notified_users': [{'identifier': 'juan'}],
+        'actor_list': [{'actor': {'identifier': 'juan'}}],
+        'started_at': datetime.now(),
+    })
+
+    assert_uses_index(execution.find({'id': 'exe'}))
+    assert_uses_index(execution.find().sort('started_at', -1))
+    assert_uses_index(execution.find().sort([
+        ('started_at', -1), ('id', 1),
+    ]))
+    assert_uses_index(
+        execution.find({'status': 'finished'}).sort('started_at', -1)
+    )
+    assert_uses_index(execution.find({
+        'process_name': 'simple.2018-02-19.xml',
+    }).sort('started_at', -1))
+    assert_uses_index(execution.find({'actor_identifiers': 'juan'}))
+    assert_uses_index(execution.find({
+        'actor_list.actor.identifier': 'juan',
+        'status': 'ongoing',
+    }).sort('started_at', -1))
+
+    assert_uses_index(pointer.find({'id': 'ptr'}))
+    assert_uses_index(pointer.find().sort('started_at', -1))
+    assert_uses_index(
+        pointer.find({'execution.id': 'exe'}).sort('started_at', -1)
+    )
+    assert_uses_index(pointer.find({
+        'execution.id': 'exe',
+        'state': 'ongoing',
+    }))
+    assert_uses_index(
+        pointer.find({'state': 'ongoing'}).sort('started_at', -1)
+    )
+    assert_uses_index(pointer.find({
+        'process_id': 'simple.2018-02-19.xml',
+        'node.id': 'start_node',
+    }))
+    assert_uses_index(pointer.find({'notified_users.identifier': 'juan'}))
+    assert_uses_index(pointer.find({
+        'notified_users.identifier': 'juan',
+        'state': 'ongoing',
+    }))
+    assert_uses_index(pointer.find({'actor_list.actor.identifier': 'juan'}))
+
+
+def test_obsolete_indexes_are_dropped(config):
+    db = MongoClient()[config['MONGO_DBNAME']]
+    pointer = db[config['POINTER_COLLECTION']]
+
+    pointer.create_index('status')
+    pointer.create_index('execution.id')
+    pointer.create_index('started_at')
+
+    # a previous version could still be using them
+    create_indexes(config)
+
+    assert 'status_1' in pointer.index_information()
+
+    migrate(config)
+
+    existing = pointer.index_information()
+
+    assert 'status_1' not in existing
+    assert 'execution.id_1' not in existing
+    assert 'started_at_1' not in existing
+    assert 'execution.id_1_started_at_-1_id_1' in existing
+    assert 'started_at_-1_id_1' in existing
+
+
+def test_actor_identifiers_are_filled(config):
+    db = MongoClient()[config['MONGO_DBNAME']]
+    execution = db[config['EXECUTION_COLLECTION']]
+
+    execution.insert_many([
+        {'id': 'old', 'actors': {'start_node': 'juan', 'mid_node': 'juan'}},
+        {'id': 'new', 'actors': {'start_node': 'pepe'}, 'actor_identifiers': [
+            'pepe',
+        ]},
+        {'id': 'empty'},
+    ])
+
+    # starting cacahuate doesn't touch the executions
+    create_indexes(config)
+
+    assert 'actor_identifiers' not in execution.find_one({'id': 'old'})
+
+    migrate(config)
+
+    assert {
+        exe['id']: exe['actor_identifiers'] for exe in execution.find()
+    } == {
+        'old': ['juan'],
+        'new': ['pepe'],
+        'empty': [],
+    }
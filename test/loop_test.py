@@ -0,0 +1,55 @@
+from queue import Queue
+from unittest.mock import MagicMock
+import logging
+import simplejson as json
+
+from cacahuate.loop import choose_queue, get_execution_id, log_queue_depth
+
+from .utils import make_pointer
+
+
+def test_get_execution_id():
+    ptr = make_pointer('simple.2018-02-19.xml', 'mid_node')
+    execution = ptr.proxy.execution.get()
+
+    assert get_execution_id(json.dumps({
+        'command': 'cancel',
+        'execution_id': execution.id,
+    })) == execution.id
+    assert get_execution_id(json.dumps({
+        'command': 'step',
+        'pointer_id': ptr.id,
+    })) == execution.id
+    assert get_execution_id(b'not json') is None
+
+
+def test_messages_of_an_execution_share_a_queue():
+    queues = [Queue() for i in range(8)]
+    ptr = make_pointer('simple.2018-02-19.xml', 'mid_node')
+    execution = ptr.proxy.execution.get()
+
+    step = choose_queue(queues, json.dumps({
+        'command': 'step',
+        'pointer_id': ptr.id,
+    }))
+    patch = choose_queue(queues, json.dumps({
+        'command': 'patch',
+        'execution_id': execution.id,
+    }))
+
+    assert step is patch
+
+
+def test_log_queue_depth(caplog):
+    queues = [Queue(maxsize=2), Queue(maxsize=2)]
+    queues[1].put('message')
+    connection = MagicMock()
+
+    with caplog.at_level(logging.INFO, logger='cacahuate.loop'):
+        log_queue_depth(connection, queues, 30)
+
+    assert 'Queue depth: 1 [0, 1]' in caplog.text
+
+    # schedules the next report
+    delay, callback = connection.call_later.call_args[0]
+    assert delay == 30
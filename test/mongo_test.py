@@ -2,8 +2,9 @@
 Tests the cacahuate.mongo module
 '''
 from datetime import datetime
+from pymongo import InsertOne, UpdateOne
 
-from cacahuate.mongo import json_prepare, make_context
+from cacahuate.mongo import json_prepare, make_context, HandlerDatabase
 
 
 def test_json_prepare():
@@ -50,3 +51,26 @@ def test_make_context(config):
     assert list(context['form1'].all())[0]['input1'] == 'A'
 
     assert context['_env']['FOO'] == 'var'
+
+
+def test_handler_database(config, mongo):
+    db = HandlerDatabase(mongo)
+    name = config['EXECUTION_COLLECTION']
+
+    db.defer(name, InsertOne({'id': 'a', 'value': 1}))
+    db.defer(name, UpdateOne({'id': 'a'}, {'$set': {'value': 2}}))
+
+    # nothing is sent until flushed
+    assert mongo[name].count_documents({}) == 0
+    assert db.counts == {'reads': 0, 'writes': 0}
+
+    # reading through the wrapper sends the deferred writes first
+    assert db[name].find_one({'id': 'a'})['value'] == 2
+    assert db.counts == {'reads': 1, 'writes': 1}
+    assert db.pending == {}
+
+    db.defer(name, UpdateOne({'id': 'a'}, {'$set': {'value': 3}}))
+    db.flush()
+
+    assert mongo[name].find_one({'id': 'a'})['value'] == 3
+    assert db.counts == {'reads': 1, 'writes': 2}
@@ -1,8 +1,15 @@
 from unittest.mock import MagicMock
+import socket
+import threading
+from xml.dom import minidom
+import pytest
 import requests
 
-from cacahuate.xml import Xml
-from cacahuate.node import make_node, Form
+from cacahuate.inputs import TextInput, INPUTS, INPUT_CLASSES, register_input
+from cacahuate.xml import Xml, NODES
+from cacahuate.node import make_node, Form, Action, NODE_CLASSES
+from cacahuate.node import register_node
+from cacahuate.sessions import get_session
 
 
 def test_resolve_params(config):
@@ -49,7 +56,7 @@ def test_request_node(config, mocker):
     mock = MagicMock(return_value=ResponseMock())
 
     mocker.patch(
-        'requests.request',
+        'requests.Session.request',
         new=mock
     )
 
@@ -64,10 +71,10 @@ def test_request_node(config, mocker):
         'request': {
             'data': '123456',
         },
-    })
+    }, config)
 
-    requests.request.assert_called_once()
-    args = requests.request.call_args
+    requests.Session.request.assert_called_once()
+    args = requests.Session.request.call_args
 
     method, url = args[0]
     data = args[1]['data']
@@ -80,6 +87,10 @@ def test_request_node(config, mocker):
         'x-url-data': '123456',
     }
     assert data == '{"data":"123456"}'
+    assert args[1]['timeout'] == (
+        config['REQUEST_CONNECT_TIMEOUT'],
+        config['REQUEST_READ_TIMEOUT'],
+    )
     assert response == [{
         'id': 'request_node',
         'items': [
@@ -112,3 +123,128 @@ def test_form_state_json():
             'item_order': [],
         },
     }
+
+
+def test_request_node_settings(config, mocker):
+    class ResponseMock:
+        status_code = 200
+        text = 'request response'
+
+    mocker.patch(
+        'requests.Session.request',
+        new=MagicMock(return_value=ResponseMock())
+    )
+
+    xml = Xml.load(config, 'request.2018-05-18')
+    xmliter = iter(xml)
+
+    next(xmliter)
+    request = next(xmliter)
+    request.setAttribute('timeout', '2.5')
+    request.setAttribute('retries', '3')
+    node = make_node(request, xmliter)
+
+    assert node.timeout == 2.5
+    assert node.retries == 3
+
+    node.make_request({'request': {'data': '1'}}, config)
+
+    args = requests.Session.request.call_args
+    assert args[1]['timeout'] == (config['REQUEST_CONNECT_TIMEOUT'], 2.5)
+
+    # templates are compiled once
+    templates = node.get_templates()
+    node.make_request({'request': {'data': '2'}}, config)
+    assert node.get_templates() is templates
+
+
+def test_sessions_are_reused(config):
+    session = get_session(config)
+
+    assert get_session(config) is session
+    assert get_session(config, config['REQUEST_RETRIES']) is session
+    assert get_session(config, 5) is not session
+
+    adapter = session.get_adapter('http://localhost')
+    assert adapter.max_retries.connect == config['REQUEST_RETRIES']
+
+
+def test_request_node_other_errors_are_not_retried(config):
+    # a plain http server, so an https request fails its ssl handshake
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(16)
+    server.settimeout(0.1)
+    attempts = []
+    done = threading.Event()
+
+    def serve():
+        while not done.is_set():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                continue
+
+            attempts.append(conn)
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')
+            conn.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    xml = Xml.load(config, 'request.2018-05-18')
+    xmliter = iter(xml)
+
+    next(xmliter)
+    request = next(xmliter)
+    request.setAttribute('retries', '3')
+    node = make_node(request, xmliter)
+    node.url = 'https://127.0.0.1:{}/'.format(server.getsockname()[1])
+
+    try:
+        data_forms = node.make_request({'request': {'data': '1'}}, config)
+    finally:
+        done.set()
+        thread.join()
+        server.close()
+
+    assert data_forms[0]['items'][0]['value'] == 0
+    assert len(attempts) == 1
+
+
+def test_register_custom_nodes():
+    class TaskNode(Action):
+        pass
+
+    class EmailInput(TextInput):
+        pass
+
+    element = minidom.parseString(
+        '<task id="custom"><node-info><name>Custom</name>'
+        '<description>Custom</description></node-info>'
+        '<auth-filter backend="anyone"/><form-array><form id="data">'
+        '<input type="email" name="email" label="Email"/>'
+        '</form></form-array></task>'
+    ).documentElement
+
+    # the element is already expanded
+    xmliter = MagicMock()
+
+    with pytest.raises(ValueError):
+        make_node(element, xmliter)
+
+    register_node('task', TaskNode)
+    register_input('email', EmailInput)
+
+    try:
+        node = make_node(element, xmliter)
+
+        assert type(node) is TaskNode
+        assert type(node.form_array[0].inputs[0]) is EmailInput
+        assert 'task' in NODES
+        assert 'email' in INPUTS
+    finally:
+        del NODE_CLASSES['task']
+        del INPUT_CLASSES['email']
+        NODES.remove('task')
+        INPUTS.remove('email')
@@ -149,6 +149,7 @@ def test_exit_interaction(config, mongo):
             'exit': '__system__',
             'start_node': 'juan',
         },
+        'actor_identifiers': ['__system__', 'juan'],
         'actor_list': [
             {
                 'node': 'start_node',
@@ -1339,6 +1339,7 @@ def test_invalidated_conditional(config, mongo):
             'else_node': '__system__',
             'else_validation_node': 'juan',
         },
+        'actor_identifiers': ['__system__', 'juan'],
 
         'actor_list': [
             {
@@ -21,7 +21,7 @@ def test_handle_request_node(config, mocker, mongo):
     mock = MagicMock(return_value=ResponseMock())
 
     mocker.patch(
-        'requests.request',
+        'requests.Session.request',
         new=mock
     )
 
@@ -56,8 +56,8 @@ def test_handle_request_node(config, mocker, mongo):
     assert ptr.node_id == 'request_node'
 
     # assert requests is called
-    requests.request.assert_called_once()
-    args, kwargs = requests.request.call_args
+    requests.Session.request.assert_called_once()
+    args, kwargs = requests.Session.request.call_args
 
     assert args[0] == 'GET'
     assert args[1] == 'http://localhost/mirror?data=' + value
@@ -139,6 +139,78 @@ def test_handle_request_node(config, mocker, mongo):
     }
 
 
+def test_handle_async_request_node(config, mocker, mongo):
+    class ResponseMock:
+        status_code = 200
+        text = 'request response'
+
+    mocker.patch(
+        'requests.Session.request',
+        new=MagicMock(return_value=ResponseMock())
+    )
+    # run the background job right away
+    mocker.patch(
+        'cacahuate.dispatch.Dispatcher.submit',
+        new=lambda self, host, job: job(),
+    )
+    publish = mocker.patch('cacahuate.dispatch.Dispatcher.publish')
+
+    handler = Handler(config)
+    user = make_user('juan', 'Juan')
+    ptr = make_pointer('request-async.2020-06-01.xml', 'start_node')
+    channel = MagicMock()
+    execution = ptr.proxy.execution.get()
+    value = random_string()
+
+    mongo[config["EXECUTION_COLLECTION"]].insert_one({
+        '_type': 'execution',
+        'id': execution.id,
+        'state': Xml.load(config, 'request-async').get_state(),
+    })
+
+    handler.step({
+        'command': 'step',
+        'pointer_id': ptr.id,
+        'user_identifier': user.identifier,
+        'input': [Form.state_json('request', [
+            {
+                'name': 'data',
+                'value': value,
+                'value_caption': value,
+            },
+        ])],
+    }, channel)
+    ptr = execution.proxy.pointers.get()[0]
+    assert ptr.node_id == 'request_node'
+
+    # the handler does not queue the input, the background job does
+    channel.basic_publish.assert_not_called()
+    assert mongo[config["POINTER_COLLECTION"]].find_one({
+        'id': ptr.id,
+    })['waiting'] == 'request'
+
+    args, kwargs = requests.Session.request.call_args
+    assert args[1] == 'http://localhost/mirror?data=' + value
+
+    publish.assert_called_once()
+    message = publish.call_args[0][0]
+
+    assert message['command'] == 'step'
+    assert message['pointer_id'] == ptr.id
+    assert message['user_identifier'] == '__system__'
+    assert message['input'][0]['ref'] == 'request_node'
+    assert message['input'][0]['inputs']['items']['status_code']['value'] \
+        == 200
+
+    # the queued step finishes the pointer
+    handler.step(message, channel)
+
+    finished = mongo[config["POINTER_COLLECTION"]].find_one({'id': ptr.id})
+
+    assert finished['state'] == 'finished'
+    assert 'waiting' not in finished
+
+
 @pytest.mark.skip
 def test_store_failed_decoding(config, mocker, mongo):
     # TODO set it up like test_store_data_from_response but make the json
@@ -276,7 +348,7 @@ def test_store_data_from_response(config, mocker, mongo):
     mock = MagicMock(return_value=ResponseMock())
 
     mocker.patch(
-        'requests.request',
+        'requests.Session.request',
         new=mock
     )
 
@@ -317,8 +389,8 @@ def test_store_data_from_response(config, mocker, mongo):
     assert ptr.node_id == 'request_node'
 
     # assert requests is called
-    requests.request.assert_called_once()
-    args, kwargs = requests.request.call_args
+    requests.Session.request.assert_called_once()
+    args, kwargs = requests.Session.request.call_args
 
     assert args[0] == 'GET'
     assert args[1] == 'http://localhost/'
@@ -221,6 +221,10 @@ def test_reject(config, mongo):
         ])],
     }, channel)
 
+    # the invalidated state is written and read back in one call, and not
+    # read again by the handler
+    assert handler.get_mongo().counts['reads'] == 0
+
     # assertions
     assert Pointer.get(ptr.id) is None
 
@@ -354,6 +358,7 @@ def test_reject(config, mongo):
         'actors': {
             'approval_node': 'juan',
         },
+        'actor_identifiers': ['juan'],
         'actor_list': [{
             'node': 'approval_node',
             'actor': {
@@ -795,6 +800,7 @@ def test_reject_with_dependencies(config, mongo):
             'node4': 'juan',
             'node5': 'juan',
         },
+        'actor_identifiers': ['juan'],
         'actor_list': [
             {
                 'node': 'node1',
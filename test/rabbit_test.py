@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock, patch
+
+import pika
+
+from cacahuate.rabbit import ChannelPool
+
+
+def make_connection(parameters):
+    connection = MagicMock()
+    connection.is_closed = False
+    connection.channel.return_value.is_closed = False
+    connection.channel.return_value.is_open = True
+
+    return connection
+
+
+def test_pool_reuses_channels(config):
+    config = dict(config, RABBIT_POOL_SIZE=1)
+    pool = ChannelPool(config)
+
+    with patch('pika.BlockingConnection', side_effect=make_connection) as bc:
+        first = pool.acquire()
+        second = pool.acquire()
+
+        assert first != second
+        assert bc.call_count == 2
+
+        pool.release(*first)
+        # the pool is full, this one is closed
+        pool.release(*second)
+
+        second[0].close.assert_called_once_with()
+
+        assert pool.acquire() == first
+        assert bc.call_count == 2
+
+    first[1].queue_declare.assert_called_once_with(
+        queue=config['RABBIT_QUEUE'],
+        durable=True,
+    )
+    first[1].confirm_delivery.assert_not_called()
+
+
+def test_pool_discards_dead_connections(config):
+    config = dict(config, RABBIT_PUBLISHER_CONFIRMS=True)
+    pool = ChannelPool(config)
+
+    with patch('pika.BlockingConnection', side_effect=make_connection) as bc:
+        first = pool.acquire()
+        pool.release(*first)
+
+        # the broker dropped the connection while it was idle
+        first[0].process_data_events.side_effect = \
+            pika.exceptions.StreamLostError()
+
+        second = pool.acquire()
+
+        assert second != first
+        assert bc.call_count == 2
+
+    first[0].close.assert_called_once_with()
+    second[1].confirm_delivery.assert_called_once_with()
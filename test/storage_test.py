@@ -21,7 +21,7 @@ def test_send_request_multiple(config, mongo, mocker):
     mock = MagicMock(return_value=ResponseMock())
 
     mocker.patch(
-        'requests.request',
+        'requests.Session.request',
         new=mock
     )
 
@@ -76,8 +76,8 @@ def test_send_request_multiple(config, mongo, mocker):
     assert ptr.node_id == 'request_node'
 
     # request is made with correct data
-    requests.request.assert_called_once()
-    args, kwargs = requests.request.call_args
+    requests.Session.request.assert_called_once()
+    args, kwargs = requests.Session.request.call_args
 
     assert args[0] == 'POST'
     assert args[1] == 'http://localhost/'
@@ -1,4 +1,6 @@
+from cacahuate.jsonpath import parse_path
 from cacahuate.models import clear_username
+from cacahuate.templates import render_or, get_template
 
 
 def test_clear_email():
@@ -7,3 +9,32 @@ def test_clear_email():
     assert clear_username('foo@var.com.mx') == 'foo'
     assert clear_username('foo.var@var.com.mx') == 'foovar'
     assert clear_username('$foo') == 'foo'
+
+
+def test_render_or():
+    context = {'form': {'name': 'Juan'}}
+
+    assert render_or('Hello {{ form.name }}', 'default', context) == 'Hello Juan'
+    assert render_or('Hello {{ form.name', 'default', context) == 'default'
+
+    # plain strings skip jinja but render the same
+    assert render_or('Hello', 'default', context) == 'Hello'
+    assert render_or('Hello\n', 'default', context) == 'Hello'
+    assert render_or('Hello\n\n', 'default', context) == 'Hello\n'
+    assert render_or('Hello\r\nworld', 'default', context) == 'Hello\nworld'
+
+
+def test_render_or_caches_templates():
+    render_or('{{ a }} and {{ b }}', '', {'a': 1, 'b': 2})
+    hits = get_template.cache_info().hits
+
+    assert render_or('{{ a }} and {{ b }}', '', {'a': 3, 'b': 4}) == '3 and 4'
+    assert get_template.cache_info().hits == hits + 1
+
+
+def test_parse_path_is_cached():
+    path = parse_path('items[0].name')
+
+    assert parse_path('items[0].name') is path
+    assert path.find({'items': [{'name': 'a'}]})[0].value == 'a'
+    assert path.find({'items': [{'name': 'b'}]})[0].value == 'b'
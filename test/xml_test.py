@@ -1,9 +1,10 @@
 import os
 import pytest
+import shutil
 
 from cacahuate.errors import ProcessNotFound
 from xml.dom.minidom import parse
-from cacahuate.xml import Xml, form_to_dict, get_element_by
+from cacahuate.xml import Xml, form_to_dict, get_element_by, get_registry
 
 
 def test_load_not_found(config):
@@ -232,6 +233,20 @@ def test_get_state(config):
     }
 
 
+def test_get_state_is_cached(config):
+    xml = Xml.load(config, 'milestones')
+
+    state = xml.get_state()
+    state['items']['start']['state'] = 'valid'
+    state['item_order'].append('other')
+
+    # the template is shared by the copies of the registry but never modified
+    assert Xml.load(config, 'milestones').get_state() == xml.get_state()
+    assert xml.get_state()['items']['start']['state'] == 'unfilled'
+    assert xml.get_state()['item_order'] == ['start', 'end']
+    assert xml.get_state() is not xml.get_state()
+
+
 def test_get_element_by(config):
     xml = Xml.load(config, 'exit_request')
     dom = xml.get_dom()
@@ -250,3 +265,68 @@ def test_get_element_by(config):
 
     assert input is not None
     assert input.getAttribute('name') == 'reason'
+
+
+def test_registry_returns_copies(config):
+    first = Xml.load(config, 'oldest')
+    second = Xml.load(config, 'oldest')
+
+    assert first is not second
+    assert first.config is config
+
+    first.versions.append('2018-02-14')
+
+    assert second.versions == ['2018-02-17']
+
+
+def test_registry_list_is_stable(config):
+    first = [xml.to_json() for xml in Xml.list(config)]
+    second = [xml.to_json() for xml in Xml.list(config)]
+
+    assert first == second
+
+
+def test_registry_refresh(config, tmpdir):
+    shutil.copy(
+        os.path.join(config['XML_PATH'], 'simple.2018-02-19.xml'),
+        str(tmpdir),
+    )
+    config['XML_PATH'] = str(tmpdir)
+
+    assert Xml.load(config, 'simple').filename == 'simple.2018-02-19.xml'
+
+    with pytest.raises(ProcessNotFound):
+        Xml.load(config, 'exit')
+
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), '..', 'xml', 'exit.2018-05-03.xml'),
+        str(tmpdir),
+    )
+    shutil.copy(
+        str(tmpdir.join('simple.2018-02-19.xml')),
+        str(tmpdir.join('simple.2018-03-01.xml')),
+    )
+    # some filesystems have coarse mtimes
+    os.utime(str(tmpdir), (0, 0))
+
+    assert Xml.load(config, 'exit').filename == 'exit.2018-05-03.xml'
+    assert Xml.load(config, 'simple').filename == 'simple.2018-03-01.xml'
+    assert get_registry(config).listdir() == [
+        'simple.2018-03-01.xml',
+        'simple.2018-02-19.xml',
+        'exit.2018-05-03.xml',
+    ]
+
+
+def test_get_form_array(config):
+    xml = Xml.load(config, 'simple')
+
+    assert xml.get_form_array() == [{
+        'ref': 'start_form',
+        'inputs': [{
+            'type': 'text',
+            'name': 'data',
+            'label': 'Info',
+            'required': True,
+        }],
+    }]
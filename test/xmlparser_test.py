@@ -0,0 +1,113 @@
+import glob
+import os
+import pytest
+
+from cacahuate.errors import MalformedProcess
+from cacahuate.node import make_node
+from cacahuate.xml import Xml, get_text
+from cacahuate.xmlparser import EtreeElement, parse_events
+
+XML_FILES = sorted(
+    os.path.basename(path)
+    for path in glob.glob(os.path.join(
+        os.path.dirname(__file__), '..', 'xml', '*.xml',
+    ))
+)
+
+
+def describe(value):
+    ''' the attributes of a built node as plain data '''
+    if isinstance(value, (list, tuple)):
+        return [describe(item) for item in value]
+
+    if isinstance(value, dict):
+        return {key: describe(item) for key, item in value.items()}
+
+    if hasattr(value, '__dict__'):
+        return {
+            key: describe(item)
+            for key, item in vars(value).items()
+            if not callable(item)
+        }
+
+    return value
+
+
+def describe_element(element):
+    return (
+        element.tagName,
+        sorted(element.attributes.items()),
+        get_text(element),
+    )
+
+
+def read_process(config, filename, backend):
+    ''' everything cacahuate reads from a process with the given backend '''
+    config = dict(config, XML_PARSER=backend)
+
+    try:
+        xml = Xml(config, filename)
+    except MalformedProcess as e:
+        return 'MalformedProcess', e.args
+
+    nodes = []
+    xmliter = iter(xml)
+
+    try:
+        for element in xmliter:
+            # the text of an element is only known once it is expanded
+            start = (element.tagName, sorted(element.attributes.items()))
+            depth = len(xmliter.block_stack)
+            node = make_node(element, xmliter)
+
+            nodes.append((start, depth, describe(node), node.get_state()))
+    except Exception as e:
+        nodes.append((type(e).__name__, str(e)))
+
+    try:
+        form_array = xml.get_form_array()
+    except Exception as e:
+        form_array = type(e).__name__
+
+    return (
+        xml.to_json(),
+        form_array,
+        nodes,
+        [
+            describe_element(element)
+            for element in xml.get_dom().getElementsByTagName('*')
+        ],
+    )
+
+
+@pytest.mark.parametrize('filename', XML_FILES)
+def test_backends_are_equivalent(config, filename):
+    assert read_process(config, filename, 'etree') == \
+        read_process(config, filename, 'minidom')
+
+
+def test_etree_expand_node(config):
+    stream = parse_events('etree', os.path.join(
+        config['XML_PATH'], 'simple.2018-02-19.xml',
+    ))
+
+    for event, element in stream:
+        if element.tagName == 'action':
+            break
+
+    assert isinstance(element, EtreeElement)
+
+    stream.expandNode(element)
+
+    forms = element.getElementsByTagName('form')
+
+    assert len(forms) > 0
+    assert forms[0].getAttribute('id')
+    assert forms[0].getAttribute('nonexistent') == ''
+    # the element itself is not part of the search
+    assert element.getElementsByTagName('action') == []
+
+
+def test_unknown_backend(config):
+    with pytest.raises(ValueError):
+        Xml(dict(config, XML_PARSER='lxml'), 'simple.2018-02-19.xml')